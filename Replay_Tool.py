@@ -10,18 +10,249 @@ Free & open-source for learning and research purposes.
 
 
 import sys
+import threading
+import time
 import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QVBoxLayout, QPushButton, QWidget, QLabel, 
                             QSlider, QHBoxLayout, QDateEdit, QSpinBox, QCheckBox,
                             QComboBox, QGroupBox, QFormLayout, QDoubleSpinBox,
-                            QFileDialog)
-from PyQt5.QtCore import Qt, QTimer, QDate
+                            QFileDialog, QLineEdit, QProgressBar, QWIDGETSIZE_MAX)
+from PyQt5.QtCore import Qt, QTimer, QDate, QRectF, QThread, pyqtSignal
 import os
 import pyqtgraph as pg
 from pyqtgraph import DateAxisItem, InfiniteLine, GraphicsLayoutWidget
 import numpy as np
-from datetime import time
 import pytz
+from data_loader import local_epoch_ns, NS_PER_MINUTE, LoadCancelled, TradingSessions, DEFAULT_SESSIONS
+from ohlcv_store import SESSION_OPEN_MINUTE
+from replay_engine import ReplayEngine, PlaybackClock, read_data_file
+from tick_feed import TickFeed
+from profiler import PROFILER
+
+# Bar length in minutes of each entry in the timeframe selector
+TIMEFRAMES = {"1min": 1, "3min": 3, "5min": 5, "15min": 15, "30min": 30, "1hour": 60}
+
+# Trading sessions to keep (see TradingSessions), first file found; 09:15-15:30 without one
+SESSIONS_FILES = (os.path.join("data", "sessions.json"), "sessions.json")
+
+# Basis line and pane label colours of the added instruments, in the order they were added
+INSTRUMENT_COLORS = ('#d35400', '#16a085', '#8e44ad', '#2c3e50', '#c0392b')
+
+# Most candles the window can show; past one per pixel they are merged (see lod.py)
+MAX_VISIBLE_CANDLES = 200_000
+
+# Plot width assumed for the level of detail while the chart has no real size yet
+MIN_DETAIL_PX = 200
+
+# First graphics layout row of the instrument panes (price, volume, RSI, MACD and basis come first)
+INSTRUMENT_ROW = 5
+
+
+class CandlestickItem(pg.GraphicsObject):
+    """Every candle of the visible window drawn by one graphics item.
+
+    Bodies and wicks are built as one QPainterPath per colour straight from
+    the OHLC arrays. The paths are rebuilt only in setData(), so panning,
+    zooming and repaints just draw the cached paths.
+    """
+
+    def __init__(self, width=2.5, up_color='g', down_color='r'):
+        super().__init__()
+        self.width = width
+        self.up_pen = pg.mkPen(up_color, width=1)
+        self.up_brush = pg.mkBrush(up_color)
+        self.down_pen = pg.mkPen(down_color, width=1)
+        self.down_brush = pg.mkBrush(down_color)
+        self.paths = []
+        self.bounds = QRectF()
+
+    def setData(self, x, opens, highs, lows, closes):
+        """Replace the candles and rebuild the cached paths"""
+        x = np.asarray(x, dtype=float)
+        opens = np.asarray(opens, dtype=float)
+        highs = np.asarray(highs, dtype=float)
+        lows = np.asarray(lows, dtype=float)
+        closes = np.asarray(closes, dtype=float)
+
+        up = closes >= opens
+        tops = np.maximum(opens, closes)
+        bottoms = np.minimum(opens, closes)
+        half = self.width / 2.0
+
+        self.paths = []
+        for mask, pen, brush in ((up, self.up_pen, self.up_brush),
+                                 (~up, self.down_pen, self.down_brush)):
+            if not mask.any():
+                continue
+            xs = x[mask]
+            # Wicks: one (x, low) -> (x, high) segment per candle
+            wicks = pg.arrayToQPath(
+                np.repeat(xs, 2),
+                np.column_stack((lows[mask], highs[mask])).ravel(),
+                connect='pairs', finiteCheck=False
+            )
+            # Bodies: one closed rectangle per candle
+            left = xs - half
+            right = xs + half
+            body_x = np.column_stack((left, right, right, left, left)).ravel()
+            body_y = np.column_stack((bottoms[mask], bottoms[mask], tops[mask],
+                                      tops[mask], bottoms[mask])).ravel()
+            connect = np.tile(np.array([1, 1, 1, 1, 0], dtype=np.int32), len(xs))
+            bodies = pg.arrayToQPath(body_x, body_y, connect=connect, finiteCheck=False)
+            self.paths.append((wicks, bodies, pen, brush))
+
+        self.prepareGeometryChange()
+        if len(x):
+            self.bounds = QRectF(x.min() - half, lows.min(),
+                                 x.max() - x.min() + self.width, highs.max() - lows.min())
+        else:
+            self.bounds = QRectF()
+        self.informViewBoundsChanged()
+        self.update()
+
+    def paint(self, p, *args):
+        for wicks, bodies, pen, brush in self.paths:
+            p.setPen(pen)
+            p.setBrush(Qt.NoBrush)
+            p.drawPath(wicks)
+            p.setBrush(brush)
+            p.drawPath(bodies)
+
+    def boundingRect(self):
+        return QRectF(self.bounds)
+
+
+class TimeAxisTicks:
+    """X-axis date and time labels of a dataset.
+
+    Each frame only picks which labels to show, from how many pixels a bar
+    gets at the current zoom, so the axis never gets crowded. Labels are
+    only made for what comes into view: dates for the days shown, times of
+    day a block of candles at a time.
+    """
+
+    TIME_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)])
+    MINUTE_STEPS = (1, 2, 3, 5, 10, 15, 30, 60, 120, 180, 375)  # Time label steps, finest first
+    MIN_TIME_SPACING = 60  # Pixels between time labels
+    MIN_DAY_SPACING = 110  # Pixels between date labels
+    BLOCK_ROWS = 1 << 14  # Candles whose times of day are worked out together
+
+    def __init__(self, data, timeline):
+        self.data = data
+        self.timeline = timeline
+        self.minute_blocks = {}  # Block number -> local minute of the day of its candles
+
+    def minutes_of_day(self, start, end):
+        """Local minute of the day of candles [start, end)"""
+        rows = self.BLOCK_ROWS
+        parts = []
+        for block in range(start // rows, (end - 1) // rows + 1):
+            if block not in self.minute_blocks:
+                epoch = self.data['epoch'][block * rows:(block + 1) * rows]
+                local_minutes = local_epoch_ns(epoch, self.data.tz) // NS_PER_MINUTE
+                self.minute_blocks[block] = (local_minutes % 1440).astype(np.int16)
+            parts.append(self.minute_blocks[block])
+        offset = start // rows * rows
+        return np.concatenate(parts)[start - offset:end - offset]
+
+    def extend(self, data, timeline):
+        """Catch up with candles appended to the data (the last one possibly
+        replaced), forgetting the times of day of the last block"""
+        if timeline is self.timeline:
+            return
+        start = max(min(len(self.timeline), len(timeline)) - 1, 0)
+        self.data = data
+        self.timeline = timeline
+        for block in [block for block in self.minute_blocks if block >= start // self.BLOCK_ROWS]:
+            del self.minute_blocks[block]
+
+    def ticks(self, x_min, x_max, width_px):
+        """Ticks for AxisItem.setTicks: [date labels, time labels]"""
+        bar_minutes = self.timeline.bar_minutes
+        first = max(int(np.floor(x_min / bar_minutes)), 0)
+        last = min(int(np.ceil(x_max / bar_minutes)), len(self.timeline) - 1)
+        if last < first or x_max <= x_min or width_px <= 0:
+            return [[], []]
+        px_per_minute = width_px / (x_max - x_min)
+        x_at_index = self.timeline.x_at_index
+        day_starts = self.data.day_starts
+        
+        # Date labels at each session open, thinned out when days are narrow
+        d_first, d_last = np.searchsorted(day_starts, [first, last + 1])
+        days = np.arange(d_first, d_last)
+        if len(days) > 1:
+            px_per_day = (x_max - x_min) * px_per_minute / len(days)
+            days = days[::max(int(np.ceil(self.MIN_DAY_SPACING / px_per_day)), 1)]
+        labels = pd.DatetimeIndex(self.data.day_dates[days]).strftime('%d-%m-%Y')
+        major = list(zip(x_at_index(day_starts[days]).tolist(), labels.tolist()))
+        
+        # Time labels on the finest step that leaves enough room between them
+        minor = []
+        for step in self.MINUTE_STEPS:
+            if step % bar_minutes == 0 and step * px_per_minute >= self.MIN_TIME_SPACING:
+                minutes = self.minutes_of_day(first, last + 1)
+                is_day_start = np.zeros(len(minutes), dtype=bool)
+                is_day_start[day_starts[d_first:d_last] - first] = True
+                keep = np.flatnonzero(((minutes - SESSION_OPEN_MINUTE) % step == 0) & ~is_day_start)
+                minor = list(zip(x_at_index(first + keep).tolist(), self.TIME_LABELS[minutes[keep]].tolist()))
+                break
+        
+        return [major, minor]
+
+
+class ChartView(GraphicsLayoutWidget):
+    """Chart widget recording each repaint as a 'paint' span"""
+
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+        self.paint_ns = 0  # Duration of the last repaint, for pacing playback
+
+    def paintEvent(self, event):
+        start = time.perf_counter_ns()
+        with self.profiler.span('paint'):
+            super().paintEvent(event)
+        self.paint_ns = time.perf_counter_ns() - start
+
+
+class DataLoadThread(QThread):
+    """Reads a data file on a worker thread, reporting progress in percent"""
+
+    progress = pyqtSignal(int)
+    loaded = pyqtSignal(object, object)  # OHLCVStore, source for follow()
+    failed = pyqtSignal(object)  # Exception raised while reading
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_path, tz, sessions):
+        super().__init__()
+        self.file_path = file_path
+        self.tz = tz
+        self.sessions = sessions
+        self.cancel_requested = False
+
+    def cancel(self):
+        """Stop at the next chunk; nothing is emitted but cancelled"""
+        self.cancel_requested = True
+
+    def report(self, fraction):
+        if self.cancel_requested:
+            raise LoadCancelled()
+        self.progress.emit(int(fraction * 100))
+
+    def run(self):
+        threading.current_thread().name = "DataLoadThread"  # As shown in saved traces
+        try:
+            with PROFILER.span('load.read'):
+                data, source = read_data_file(self.file_path, self.tz, progress=self.report,
+                                              sessions=self.sessions)
+            if self.cancel_requested:
+                raise LoadCancelled()
+            self.loaded.emit(data, source)
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(e)
+
 
 class CandleReplay(QWidget):
     def __init__(self):
@@ -37,9 +268,24 @@ class CandleReplay(QWidget):
         # Button states
         self.is_playing = False
 
-        self.df = None
-        self.current_idx = 0
-        self.speed = 500  # milliseconds
+        # Data, timeframes, indicator settings and the cursor; this widget only draws them
+        self.profiler = PROFILER  # Stage timings, while profiling is on
+        self.sessions_warning = None  # Why the sessions file was ignored, shown in the sidebar
+        self.sessions = self.load_sessions()
+        self.engine = ReplayEngine(self.local_tz, self.sessions)
+        self.engine.add_listener(self.on_bar)
+        self.follow_timer = QTimer()  # Polls the followed file for appended rows
+        self.follow_timer.timeout.connect(self.poll_file)
+        self.feed = None  # TickFeed pushing bars from a tick source
+        self.feed_timer = QTimer()  # Drains the feed's bars on the GUI thread
+        self.feed_timer.timeout.connect(self.drain_feed)
+        self.load_thread = None  # DataLoadThread of the file being loaded
+        self.load_threads = []  # Every DataLoadThread still running, kept alive until done
+        self.tick_cache = {}  # minutes -> TimeAxisTicks
+        self.time_ticks = None  # TimeAxisTicks of the data being replayed
+        self.tick_key = None  # (x_min, x_max, width) the axis ticks were built for
+        self.speed = 500  # milliseconds per bar
+        self.playback_clock = PlaybackClock(self.speed)  # Paces play() against the wall clock
         self.visible_candle_count = 100  # Default visible candles
         self.current_file_path = None  # Track loaded file
         
@@ -60,6 +306,7 @@ class CandleReplay(QWidget):
         self.macd_fast = 12
         self.macd_slow = 26
         self.macd_signal = 9
+        self.engine.set_params(self.indicator_params())
 
         # Main horizontal layout
         main_layout = QHBoxLayout()
@@ -78,8 +325,31 @@ class CandleReplay(QWidget):
         # Load initial data
         self.load_default_data()
 
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.next_candle)
+        self.timer = QTimer()  # Single shot, rearmed by playback_tick() for when the next frame is due
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.playback_tick)
+        screen = QApplication.primaryScreen()
+        if screen is not None and screen.refreshRate() > 0:
+            self.playback_clock.frame_ns = int(1e9 / screen.refreshRate())
+        
+        self.profile_timer = QTimer()  # Refreshes the profiling overlay
+        self.profile_timer.timeout.connect(self.update_profile_overlay)
+        if self.profiler.enabled:
+            self.profile_check.setChecked(True)
+
+    @property
+    def data(self):
+        """OHLCVStore being replayed"""
+        return self.engine.data
+
+    @property
+    def timeline(self):
+        return self.engine.timeline
+
+    @property
+    def current_idx(self):
+        return self.engine.current_idx
 
     def create_left_sidebar(self):
         """Create left sidebar with controls"""
@@ -109,6 +379,26 @@ class CandleReplay(QWidget):
         self.file_path_label.setStyleSheet("color: gray; font-size: 9px; padding: 2px;")
         data_layout.addWidget(self.file_path_label)
         
+        # Stays up while files load, unlike the file label
+        self.sessions_label = QLabel(self.sessions_warning or "")
+        self.sessions_label.setWordWrap(True)
+        self.sessions_label.setStyleSheet("color: #d35400; font-size: 9px; padding: 2px;")
+        self.sessions_label.setVisible(self.sessions_warning is not None)
+        data_layout.addWidget(self.sessions_label)
+        
+        # Progress of a file loading in the background
+        self.load_progress_widget = QWidget()
+        load_progress_layout = QHBoxLayout(self.load_progress_widget)
+        load_progress_layout.setContentsMargins(0, 0, 0, 0)
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 100)
+        load_progress_layout.addWidget(self.load_progress, stretch=1)
+        self.cancel_load_button = QPushButton("✖ Cancel")
+        self.cancel_load_button.clicked.connect(self.cancel_load)
+        load_progress_layout.addWidget(self.cancel_load_button)
+        self.load_progress_widget.hide()
+        data_layout.addWidget(self.load_progress_widget)
+        
         # Separator
         separator = QLabel("─" * 30)
         separator.setAlignment(Qt.AlignCenter)
@@ -118,19 +408,66 @@ class CandleReplay(QWidget):
         default_layout = QFormLayout()
         default_layout.setSpacing(5)
         self.timeframe_combo = QComboBox()
-        self.timeframe_combo.addItems(["1min", "3min", "5min", "15min", "30min", "1hour"])
+        self.timeframe_combo.addItems(list(TIMEFRAMES))
         self.timeframe_combo.setCurrentText("3min")
+        self.timeframe_combo.currentTextChanged.connect(self.change_timeframe)
         default_layout.addRow("Timeframe:", self.timeframe_combo)
         
         self.reload_button = QPushButton("🔄 Load Default Data")
         self.reload_button.clicked.connect(self.load_default_data)
         default_layout.addRow(self.reload_button)
         
+        # Live mode: pick up rows a recorder appends to the loaded CSV
+        self.follow_check = QCheckBox("📡 Follow File (Live)")
+        self.follow_check.stateChanged.connect(self.toggle_follow)
+        default_layout.addRow(self.follow_check)
+        
+        # Live mode: bars built from a tick publisher
+        self.feed_edit = QLineEdit()
+        self.feed_edit.setPlaceholderText("tcp://127.0.0.1:9000")
+        self.feed_edit.setToolTip("tcp://host:port, udp://host:port, unix:///path or file://ticks.csv?speed=10")
+        default_layout.addRow("Feed:", self.feed_edit)
+        self.feed_button = QPushButton("🔌 Connect Feed")
+        self.feed_button.clicked.connect(self.toggle_feed)
+        default_layout.addRow(self.feed_button)
+        self.feed_label = QLabel("")
+        self.feed_label.setStyleSheet("color: gray; font-size: 9px; padding: 2px;")
+        default_layout.addRow(self.feed_label)
+        
         data_layout.addLayout(default_layout)
         
         data_group.setLayout(data_layout)
         sidebar_layout.addWidget(data_group)
 
+        # Other instruments replayed in lockstep with the loaded file
+        instruments_group = QGroupBox("🔗 Instruments")
+        instruments_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        instruments_layout = QVBoxLayout()
+        instruments_layout.setSpacing(5)
+        
+        instrument_buttons = QHBoxLayout()
+        self.add_instrument_button = QPushButton("➕ Add Instrument")
+        self.add_instrument_button.setToolTip("Futures or option data replayed in its own pane, on the same clock")
+        self.add_instrument_button.clicked.connect(self.browse_instrument)
+        instrument_buttons.addWidget(self.add_instrument_button)
+        self.clear_instruments_button = QPushButton("✖ Clear")
+        self.clear_instruments_button.clicked.connect(self.clear_instruments)
+        instrument_buttons.addWidget(self.clear_instruments_button)
+        instruments_layout.addLayout(instrument_buttons)
+        
+        self.instruments_label = QLabel("")
+        self.instruments_label.setWordWrap(True)
+        self.instruments_label.setStyleSheet("color: gray; font-size: 9px; padding: 2px;")
+        instruments_layout.addWidget(self.instruments_label)
+        
+        self.basis_check = QCheckBox("Basis (instrument - loaded file)")
+        self.basis_check.setChecked(True)
+        self.basis_check.stateChanged.connect(self.on_indicator_changed)
+        instruments_layout.addWidget(self.basis_check)
+        
+        instruments_group.setLayout(instruments_layout)
+        sidebar_layout.addWidget(instruments_group)
+
         # Indicators Section
         indicators_group = QGroupBox("📈 Indicators")
         indicators_group.setStyleSheet("QGroupBox { font-weight: bold; }")
@@ -250,14 +587,19 @@ class CandleReplay(QWidget):
         
         self.candle_count_spin = QSpinBox()
         self.candle_count_spin.setMinimum(20)
-        self.candle_count_spin.setMaximum(1000)
+        self.candle_count_spin.setMaximum(MAX_VISIBLE_CANDLES)
         self.candle_count_spin.setValue(self.visible_candle_count)
         self.candle_count_spin.valueChanged.connect(self.update_candle_count)
         display_layout.addRow("Visible Candles:", self.candle_count_spin)
         
-        self.optimize_check = QCheckBox("Optimize Performance")
-        self.optimize_check.setChecked(True)
-        display_layout.addRow(self.optimize_check)
+        self.profile_check = QCheckBox("⏱ Profiling Overlay")
+        self.profile_check.stateChanged.connect(self.toggle_profiling)
+        display_layout.addRow(self.profile_check)
+        
+        self.trace_button = QPushButton("💾 Save Trace")
+        self.trace_button.clicked.connect(self.save_trace)
+        self.trace_button.setEnabled(False)
+        display_layout.addRow(self.trace_button)
         
         display_group.setLayout(display_layout)
         sidebar_layout.addWidget(display_group)
@@ -292,9 +634,18 @@ class CandleReplay(QWidget):
         self.chart_widget.setLayout(chart_layout)
 
         # Graphics layout for stacked charts
-        self.graphics_layout = GraphicsLayoutWidget()
+        self.graphics_layout = ChartView(self.profiler)
         self.graphics_layout.setBackground('w')
         chart_layout.addWidget(self.graphics_layout, stretch=1)
+        
+        # Frame rate and stage times, drawn over the chart while profiling
+        self.profile_label = QLabel(self.graphics_layout)
+        self.profile_label.setStyleSheet(
+            "background: rgba(255, 255, 255, 210); border: 1px solid gray; "
+            "font-family: monospace; font-size: 10px; padding: 3px;")
+        self.profile_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.profile_label.move(90, 10)
+        self.profile_label.hide()
 
         # Price chart (main) - row 0
         self.date_axis = DateAxisItem(orientation='bottom')
@@ -329,7 +680,7 @@ class CandleReplay(QWidget):
         self.rsi_plot.showGrid(x=True, y=True, alpha=0.3)
         self.rsi_plot.setLabel('left', 'RSI')
         self.rsi_plot.setMinimumHeight(80)
-        self.rsi_plot.hide()  # Initially hidden
+        self.set_pane_visible(self.rsi_plot, False)  # Initially hidden
         
         # MACD chart - row 3 (will be shown/hidden based on checkbox)
         self.macd_plot = self.graphics_layout.addPlot(row=3, col=0)
@@ -337,15 +688,38 @@ class CandleReplay(QWidget):
         self.macd_plot.showGrid(x=True, y=True, alpha=0.3)
         self.macd_plot.setLabel('left', 'MACD')
         self.macd_plot.setMinimumHeight(80)
-        self.macd_plot.hide()  # Initially hidden
+        self.set_pane_visible(self.macd_plot, False)  # Initially hidden
+        
+        # Basis of the added instruments - row 4 (shown while there are any)
+        self.basis_plot = self.graphics_layout.addPlot(row=4, col=0)
+        self.basis_plot.setMouseEnabled(x=True, y=True)
+        self.basis_plot.showGrid(x=True, y=True, alpha=0.3)
+        self.basis_plot.setLabel('left', 'Basis')
+        self.basis_plot.setMinimumHeight(80)
+        self.set_pane_visible(self.basis_plot, False)
+        
+        # Instrument panes from row 5 on, created as instruments are added
+        self.instrument_panes = {}  # name -> (plot, CandlestickItem, basis curve)
         
         # Link X-axes
         self.volume_plot.setXLink(self.price_plot)
         self.rsi_plot.setXLink(self.price_plot)
         self.macd_plot.setXLink(self.price_plot)
+        self.basis_plot.setXLink(self.price_plot)
+
+        # Persistent plot items, updated in place on every frame
+        self.create_series_items()
+
+        # Axis labels and the level of detail follow panning, zooming and resizing
+        self.price_plot.sigXRangeChanged.connect(self.update_ticks)
+        self.price_plot.vb.sigResized.connect(self.update_ticks)
+        self.price_plot.sigXRangeChanged.connect(self.update_detail)
+        self.price_plot.vb.sigResized.connect(self.update_detail)
 
         # Enable mouse interaction
-        self.graphics_layout.scene().sigMouseMoved.connect(self.mouse_moved)
+        # Mouse moves are rate-limited; the proxy must stay referenced
+        self.mouse_proxy = pg.SignalProxy(self.graphics_layout.scene().sigMouseMoved,
+                                          rateLimit=60, slot=self.mouse_moved)
         self.graphics_layout.scene().sigMouseClicked.connect(self.mouse_clicked)
 
         # Control panel
@@ -376,11 +750,13 @@ class CandleReplay(QWidget):
         # Speed control
         controls_layout.addWidget(QLabel("Speed:"))
         self.speed_slider = QSlider(Qt.Horizontal)
-        self.speed_slider.setMinimum(100)
+        self.speed_slider.setMinimum(10)
         self.speed_slider.setMaximum(2000)
         self.speed_slider.setValue(self.speed)
         self.speed_slider.setTickInterval(100)
         self.speed_slider.setFixedWidth(100)
+        self.speed_slider.setToolTip("Milliseconds per bar; faster than the display refreshes, "
+                                     "several bars are drawn per frame")
         self.speed_slider.valueChanged.connect(self.update_speed)
         controls_layout.addWidget(self.speed_slider)
         
@@ -399,6 +775,19 @@ class CandleReplay(QWidget):
         self.date_picker.dateChanged.connect(self.jump_to_date)
         controls_layout.addWidget(self.date_picker)
 
+        self.prev_day_button = QPushButton("⏮️ Prev Day")
+        self.prev_day_button.clicked.connect(self.previous_day)
+        controls_layout.addWidget(self.prev_day_button)
+
+        self.session_open_button = QPushButton("🔔 Open")
+        self.session_open_button.setToolTip("Jump to the open of the current session")
+        self.session_open_button.clicked.connect(self.session_open)
+        controls_layout.addWidget(self.session_open_button)
+
+        self.next_day_button = QPushButton("⏭️ Next Day")
+        self.next_day_button.clicked.connect(self.next_day)
+        controls_layout.addWidget(self.next_day_button)
+
         controls_layout.addWidget(QLabel("Candle:"))
         self.candle_slider = QSpinBox()
         self.candle_slider.setMinimum(1)
@@ -412,6 +801,189 @@ class CandleReplay(QWidget):
         self.info_label.setStyleSheet("padding: 5px; background-color: #f8f9fa; border: 1px solid #dee2e6;")
         chart_layout.addWidget(self.info_label)
 
+    def create_series_items(self):
+        """Create one persistent plot item per series so replay never clears the plots"""
+        # Price overlays
+        self.vwap_curve = pg.PlotCurveItem(pen=pg.mkPen('k', width=2, style=Qt.DotLine), name="VWAP")
+        self.ema_curve = pg.PlotCurveItem(pen=pg.mkPen('b', width=2))
+        self.sma_curve = pg.PlotCurveItem(pen=pg.mkPen('orange', width=2))
+        self.bb_upper_curve = pg.PlotCurveItem(pen=pg.mkPen('purple', width=1, style=Qt.DashLine))
+        self.bb_mid_curve = pg.PlotCurveItem(pen=pg.mkPen('purple', width=1))
+        self.bb_lower_curve = pg.PlotCurveItem(pen=pg.mkPen('purple', width=1, style=Qt.DashLine))
+        for item in (self.vwap_curve, self.ema_curve, self.sma_curve,
+                     self.bb_upper_curve, self.bb_mid_curve, self.bb_lower_curve):
+            self.price_plot.addItem(item)
+
+        # Candles
+        self.candles = CandlestickItem(width=2.5)
+        self.price_plot.addItem(self.candles)
+
+        # Up/down brushes and pens shared by every volume and histogram bar,
+        # indexed with a 0/1 mask instead of building a colour per bar
+        self.bar_brushes = np.array([pg.mkBrush('g'), pg.mkBrush('r')], dtype=object)
+        self.bar_pens = np.array([pg.mkPen('g'), pg.mkPen('r')], dtype=object)
+
+        # Volume
+        self.volume_bars = pg.BarGraphItem(x=np.empty(0), height=np.empty(0), width=2.5)
+        self.volume_plot.addItem(self.volume_bars)
+
+        # RSI with overbought/oversold lines
+        self.rsi_curve = pg.PlotCurveItem(pen=pg.mkPen('purple', width=2))
+        self.rsi_plot.addItem(self.rsi_curve)
+        self.rsi_plot.addItem(pg.InfiniteLine(pos=70, angle=0, pen=pg.mkPen('r', width=1, style=Qt.DashLine)))
+        self.rsi_plot.addItem(pg.InfiniteLine(pos=30, angle=0, pen=pg.mkPen('g', width=1, style=Qt.DashLine)))
+
+        # MACD, signal, histogram and zero line
+        self.macd_hist = pg.BarGraphItem(x=np.empty(0), height=np.empty(0), width=2)
+        self.macd_curve = pg.PlotCurveItem(pen=pg.mkPen('b', width=2), name='MACD')
+        self.signal_curve = pg.PlotCurveItem(pen=pg.mkPen('r', width=2), name='Signal')
+        for item in (self.macd_hist, self.macd_curve, self.signal_curve):
+            self.macd_plot.addItem(item)
+        self.macd_plot.addItem(pg.InfiniteLine(pos=0, angle=0, pen=pg.mkPen('k', width=1)))
+
+        # Window drawn by the last frame: (start_idx, end_idx)
+        self.drawn_window = None
+        self.visible_range = None  # Window of the frame being drawn, set before drawing starts
+        
+        # Candles of that window drawn now, as (start_idx, end_idx, level):
+        # level k merges them in blocks of 2**k, for zoomed out views
+        self.detail = None
+        self.detail_blocks = None  # OHLCPyramid.blocks() of the main candles, or None at level 0
+        self.frame_draws = []  # (method, args) drawing the frame's series, redone when the detail changes
+
+    def set_bars(self, bars, x, height, down):
+        """Update a persistent bar item, coloured red where `down` is True"""
+        index = down.astype(np.intp)
+        bars.setOpts(x=x, height=height,
+                     brushes=self.bar_brushes[index], pens=self.bar_pens[index])
+        bars.show()
+
+    def detail_px(self):
+        """Plot width in pixels, the most candles drawn one by one"""
+        return max(int(self.price_plot.vb.width()), MIN_DETAIL_PX)
+
+    def set_detail(self, start, end, level):
+        """Draw candles [start, end) of the frame, merged in blocks of 2**level"""
+        self.detail = (start, end, level)
+        offset = self.visible_range[0]
+        x = self.frame_x
+        if level:
+            self.detail_blocks = self.engine.level.pyramid.blocks(start, end, level)
+            self.detail_first = self.detail_blocks['first'] - offset
+            self.detail_last = self.detail_blocks['last'] - offset
+            self.detail_x = (x[self.detail_first] + x[self.detail_last]) / 2
+        else:
+            self.detail_blocks = None
+            self.detail_slice = slice(start - offset, end - offset)
+            self.detail_x = x[self.detail_slice]
+        self.detail_width = 0.8 * self.timeline.bar_minutes * (1 << level)
+
+    def update_detail(self):
+        """Redraw at the level of detail the zoomed, panned or resized view needs"""
+        if self.detail is None or self.data is None:
+            return
+        start_idx, end_idx = self.visible_range
+        (x_min, x_max), _ = self.price_plot.viewRange()
+        view_start, view_end = self.timeline.index_span(x_min, x_max)
+        view_start, view_end = max(view_start, start_idx), min(view_end, end_idx)
+        if view_end <= view_start:
+            return
+        rows = view_end - view_start
+        level = self.engine.level.pyramid.level_for(rows, self.detail_px())
+        start, end, drawn_level = self.detail
+        if level == drawn_level and start <= view_start and view_end <= end:
+            return
+        with self.profiler.span('chart.detail'):
+            # A view's width more on each side, so panning only redraws now and then
+            self.set_detail(max(view_start - rows, start_idx), min(view_end + rows, end_idx), level)
+            for method, args in self.frame_draws:
+                method(*args)
+
+    def frame_draw(self, method, *args):
+        """Draw a series of the frame, keeping the call for update_detail()"""
+        self.frame_draws.append((method, args))
+        method(*args)
+
+    def detail_values(self, values):
+        """A frame array cut to the drawn candles, one value per block (its last) when merged"""
+        if self.detail_blocks is None:
+            return values[self.detail_slice]
+        return values[self.detail_last]
+
+    def draw_series(self, curve, values, connect='all'):
+        """Show a persistent curve with a frame array, at the current level of detail"""
+        if not isinstance(connect, str):
+            if self.detail_blocks is None:
+                connect = connect[self.detail_slice]
+            else:
+                # Broken between two blocks when broken anywhere between their last candles
+                connect = np.minimum.reduceat(connect, self.detail_last)
+        self.set_series(curve, True, self.detail_x, self.detail_values(values), connect)
+
+    def draw_candles(self, candles, opens, highs, lows, closes):
+        """Show a CandlestickItem with frame arrays, one merged candle per block
+        when zoomed out; candles with no data (NaN) are left out"""
+        if self.detail_blocks is None:
+            cut = self.detail_slice
+            opens, highs, lows, closes = opens[cut], highs[cut], lows[cut], closes[cut]
+        elif candles is self.candles:
+            blocks = self.detail_blocks
+            opens, highs, lows, closes = blocks['open'], blocks['high'], blocks['low'], blocks['close']
+        else:
+            first, last = self.detail_first, self.detail_last
+            end = last[-1] + 1
+            opens, closes = opens[first], closes[last]
+            highs = np.fmax.reduceat(highs[:end], first)
+            lows = np.fmin.reduceat(lows[:end], first)
+        valid = ~(np.isnan(opens) | np.isnan(closes))
+        candles.width = self.detail_width
+        candles.setData(self.detail_x[valid], opens[valid], highs[valid], lows[valid], closes[valid])
+
+    def draw_volume(self, volume, down):
+        """Volume bars, summed per block when zoomed out"""
+        if self.detail_blocks is None:
+            volume, down = volume[self.detail_slice], down[self.detail_slice]
+        else:
+            blocks = self.detail_blocks
+            volume, down = blocks['volume'], blocks['close'] < blocks['open']
+        self.volume_bars.setOpts(width=self.detail_width)
+        self.set_bars(self.volume_bars, self.detail_x, volume, down)
+        
+        # Set volume Y-range
+        max_vol = volume.max() if len(volume) else 0
+        if max_vol > 0:
+            self.volume_plot.setYRange(0, max_vol * 1.1, padding=0)
+
+    def draw_histogram(self, bars, values):
+        """Bars of a frame array, red below zero; NaN values are left out"""
+        values = self.detail_values(values)
+        valid = ~np.isnan(values)
+        if valid.any():
+            bars.setOpts(width=self.detail_width)
+            self.set_bars(bars, self.detail_x[valid], values[valid], values[valid] < 0)
+        else:
+            bars.hide()
+
+    def view_x_range(self, x_values):
+        """X range showing the given candles with five bars of margin on each side"""
+        margin = 5 * self.timeline.bar_minutes
+        return x_values[0] - margin, x_values[-1] + margin
+
+    def set_series(self, curve, visible, x=None, y=None, connect='all'):
+        """Show a persistent curve with new data, or hide it"""
+        if visible:
+            curve.setData(x, y, connect=connect)
+            curve.show()
+        else:
+            curve.hide()
+
+    def set_pane_visible(self, plot, visible, height=80):
+        """Show or hide a pane under the price chart. The layout keeps room for
+        hidden items, so a hidden pane is also collapsed to no height."""
+        plot.setVisible(visible)
+        plot.setMinimumHeight(height if visible else 0)
+        plot.setMaximumHeight(QWIDGETSIZE_MAX if visible else 0)
+
     def resizeEvent(self, event):
         """Handle window resize event"""
         super().resizeEvent(event)
@@ -440,42 +1012,170 @@ class CandleReplay(QWidget):
             row += 1
         if self.show_macd:
             self.graphics_layout.ci.layout.setRowStretchFactor(row, 1)
+        
+        # Basis and instrument panes
+        layout = self.graphics_layout.ci.layout
+        layout.setRowStretchFactor(4, 1 if self.basis_plot.isVisible() else 0)
+        for row in range(INSTRUMENT_ROW, layout.rowCount()):
+            layout.setRowStretchFactor(row, 2)
 
     def browse_file(self):
-        """Open file dialog to select CSV file"""
+        """Open file dialog to select a CSV file or an OHLCV store"""
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Select CSV Data File",
             "",
-            "CSV Files (*.csv);;All Files (*)"
+            "CSV Files (*.csv);;OHLCV Store (meta.json);;All Files (*)"
         )
         
         if file_path:
-            self.current_file_path = file_path
             self.load_data_from_file(file_path)
 
+    def browse_instrument(self):
+        """Pick a CSV file or OHLCV store to replay alongside the loaded one"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Select Instrument Data File",
+            "",
+            "CSV Files (*.csv);;OHLCV Store (meta.json);;All Files (*)"
+        )
+        
+        if file_path:
+            self.load_instrument(file_path)
+
+    def load_instrument(self, file_path, wait=False):
+        """Read another instrument (on a worker thread unless wait=True) and
+        add it under its file name"""
+        if wait:
+            try:
+                data, _ = read_data_file(file_path, self.local_tz, sessions=self.sessions)
+            except Exception as e:
+                self.instruments_label.setText(f"❌ {os.path.basename(file_path)}: {str(e)[:50]}")
+                return
+            self.add_instrument(file_path, data)
+            return
+        
+        thread = DataLoadThread(file_path, self.local_tz, self.sessions)
+        thread.loaded.connect(lambda data, source: self.add_instrument(thread.file_path, data))
+        thread.failed.connect(lambda error: self.instruments_label.setText(
+            f"❌ {os.path.basename(thread.file_path)}: {str(error)[:50]}"))
+        thread.finished.connect(self.on_load_thread_done)
+        self.load_threads.append(thread)
+        self.instruments_label.setText(f"⏳ Loading: {os.path.basename(file_path)}")
+        thread.start()
+
+    def add_instrument(self, file_path, data):
+        """Replay an instrument in its own pane, linked to the price chart"""
+        name = os.path.splitext(os.path.basename(file_path.rstrip('/\\')))[0]
+        if name == 'meta':
+            name = os.path.basename(os.path.dirname(file_path))
+        try:
+            self.engine.add_instrument(name, data)
+        except ValueError as e:
+            self.instruments_label.setText(f"❌ {e}")
+            return
+        
+        if name not in self.instrument_panes:
+            plot = self.graphics_layout.addPlot(row=INSTRUMENT_ROW + len(self.instrument_panes), col=0)
+            plot.setMouseEnabled(x=True, y=True)
+            plot.showGrid(x=True, y=True, alpha=0.3)
+            # The pane's label has the colour of its basis line
+            color = INSTRUMENT_COLORS[len(self.instrument_panes) % len(INSTRUMENT_COLORS)]
+            plot.setLabel('left', name, color=color)
+            plot.setMinimumHeight(120)
+            plot.setXLink(self.price_plot)
+            candles = CandlestickItem()
+            plot.addItem(candles)
+            basis = pg.PlotCurveItem(pen=pg.mkPen(color, width=2))
+            self.basis_plot.addItem(basis)
+            self.instrument_panes[name] = (plot, candles, basis)
+        self.update_instruments_label()
+        self.drawn_window = None
+        self.update_chart()
+
+    def clear_instruments(self):
+        """Drop every added instrument and its pane"""
+        for name, (plot, _, basis) in self.instrument_panes.items():
+            self.engine.remove_instrument(name)
+            self.graphics_layout.removeItem(plot)
+            self.basis_plot.removeItem(basis)
+        self.instrument_panes = {}
+        self.set_pane_visible(self.basis_plot, False)
+        self.update_instruments_label()
+        self.drawn_window = None
+        self.update_chart()
+
+    def update_instruments_label(self):
+        self.instruments_label.setText(", ".join(self.instrument_panes))
+
+    def plot_instruments(self, start_idx, end_idx):
+        """Draw each instrument's candles and its basis against the loaded file"""
+        show_basis = self.basis_check.isChecked()
+        basis_range = []
+        for name, (plot, candles, basis_curve) in self.instrument_panes.items():
+            columns = self.engine.instrument_window(name, start_idx, end_idx)
+            if columns is None:
+                # Its bars can't be resampled to the replayed timeframe
+                candles.setData([], [], [], [], [])
+                self.set_series(basis_curve, False)
+                continue
+            
+            self.frame_draw(self.draw_candles, candles, columns['open'], columns['high'],
+                            columns['low'], columns['close'])
+            valid = ~np.isnan(columns['close'])
+            if valid.any():
+                low, high = columns['low'][valid].min(), columns['high'][valid].max()
+                buffer = (high - low) * 0.05 or 1.0
+                plot.setYRange(low - buffer, high + buffer, padding=0)
+            self.hover_series.append((name, columns['close']))
+            
+            if show_basis:
+                basis = columns['last'] - self.frame_arrays['close']
+                self.frame_draw(self.draw_series, basis_curve, basis, 'finite')
+                self.hover_series.append((f"Basis {name}", basis))
+                if not np.isnan(basis).all():
+                    basis_range += [np.nanmin(basis), np.nanmax(basis)]
+            else:
+                self.set_series(basis_curve, False)
+        
+        if basis_range:
+            low, high = min(basis_range), max(basis_range)
+            buffer = (high - low) * 0.1 or 1.0
+            self.basis_plot.setYRange(low - buffer, high + buffer, padding=0)
+
+    def load_sessions(self):
+        """Trading sessions from the first sessions file found, else regular hours"""
+        for file_path in SESSIONS_FILES:
+            if os.path.exists(file_path):
+                try:
+                    return TradingSessions.load(file_path)
+                except (OSError, ValueError, AttributeError) as e:
+                    self.sessions_warning = f"⚠️ Ignoring {file_path}: {e}"
+        return DEFAULT_SESSIONS
+
     def load_default_data(self):
-        """Load default data file based on timeframe selection"""
+        """Load the 1min base file (or the file for the selected timeframe)"""
         timeframe = self.timeframe_combo.currentText()
         default_file = f"Nifty_Fut_{timeframe}.csv"
         
         # Check multiple relative locations
-        possible_paths = [
-            # Option 1: In a 'data' folder next to the script
-            os.path.join("data", default_file),
-            # Option 2: In the same folder as the script
-            default_file,
-            # Option 3: In a 'Data' folder (capital D)
-            os.path.join("Data", default_file),
-            # Option 4: In 'data_files' folder
-            os.path.join("data_files", default_file),
-        ]
+        possible_paths = []
+        # Every timeframe is resampled from the 1min file when it is there
+        for file_name in dict.fromkeys(["Nifty_Fut_1min.csv", default_file]):
+            possible_paths += [
+                # Option 1: In a 'data' folder next to the script
+                os.path.join("data", file_name),
+                # Option 2: In the same folder as the script
+                file_name,
+                # Option 3: In a 'Data' folder (capital D)
+                os.path.join("Data", file_name),
+                # Option 4: In 'data_files' folder
+                os.path.join("data_files", file_name),
+            ]
         
         for file_path in possible_paths:
             if os.path.exists(file_path):
-                self.current_file_path = file_path
                 self.load_data_from_file(file_path)
-                self.file_path_label.setText(f"Loaded: {default_file}")
                 return
         
         # If no file found, show helpful instructions
@@ -488,49 +1188,277 @@ class CandleReplay(QWidget):
         self.stats_label.setText(error_msg)
         self.file_path_label.setText(f"File missing: {default_file}")
 
-    def load_data_from_file(self, file_path):
-        """Load data from specified CSV file"""
+    def load_data_from_file(self, file_path, wait=False):
+        """Load data from specified CSV file or memory-mapped OHLCV store.
+
+        The file is read on a worker thread and the current chart stays
+        usable until the new data is swapped in; wait=True reads it on
+        the calling thread instead.
+        """
+        self.cancel_load()
+        if wait:
+            try:
+                with self.profiler.span('load.read'):
+                    data, source = read_data_file(file_path, self.local_tz, sessions=self.sessions)
+            except Exception as e:
+                self.load_failed(file_path, e)
+                return
+            self.finish_load(file_path, data, source)
+            return
+        
+        thread = DataLoadThread(file_path, self.local_tz, self.sessions)
+        thread.progress.connect(self.load_progress.setValue)
+        thread.loaded.connect(self.on_load_finished)
+        thread.failed.connect(self.on_load_failed)
+        thread.finished.connect(self.on_load_thread_done)
+        self.load_thread = thread
+        self.load_threads.append(thread)
+        
+        self.file_path_label.setText(f"⏳ Loading: {os.path.basename(file_path)}")
+        self.file_path_label.setStyleSheet("color: gray; font-size: 9px; padding: 2px;")
+        self.load_progress.setValue(0)
+        self.load_progress_widget.show()
+        thread.start()
+
+    def cancel_load(self):
+        """Abandon the file loading in the background, keeping the current data"""
+        if self.load_thread is None:
+            return
+        self.load_thread.cancel()
+        self.load_thread = None
+        self.load_progress_widget.hide()
+        if self.data is not None:
+            self.file_path_label.setText(f"✅ Loaded: {os.path.basename(self.current_file_path or '')}")
+            self.file_path_label.setStyleSheet("color: green; font-size: 9px; padding: 2px;")
+        else:
+            self.file_path_label.setText("No file selected")
+            self.file_path_label.setStyleSheet("color: gray; font-size: 9px; padding: 2px;")
+
+    def on_load_finished(self, data, source):
+        # Ignore a load that was cancelled or replaced while it finished
+        if self.sender() is not self.load_thread:
+            return
+        self.load_thread = None
+        self.load_progress_widget.hide()
+        self.finish_load(self.sender().file_path, data, source)
+
+    def on_load_failed(self, error):
+        if self.sender() is not self.load_thread:
+            return
+        self.load_thread = None
+        self.load_progress_widget.hide()
+        self.load_failed(self.sender().file_path, error)
+
+    def on_load_thread_done(self):
+        thread = self.sender()
+        if thread in self.load_threads:
+            self.load_threads.remove(thread)
+        thread.deleteLater()
+
+    def finish_load(self, file_path, data, source):
+        """Swap the newly read data in and start replaying it"""
+        self.stop_follow()
+        self.stop_feed()
         try:
-            self.df = pd.read_csv(
-                file_path,
-                parse_dates=['datetime'],
-                dayfirst=True
-            )
-            
-            if not pd.api.types.is_datetime64_any_dtype(self.df['datetime']):
-                self.df['datetime'] = pd.to_datetime(self.df['datetime'], dayfirst=True)
-            
-            self.df['datetime'] = self.df['datetime'].dt.tz_localize(self.local_tz)
-            self.df = self.df.sort_values('datetime').reset_index(drop=True)
-            self.df = self.df[self.df['datetime'].dt.tz_convert(self.local_tz).dt.time.between(time(9,15), time(15,30))]
-            self.df = self.df.drop_duplicates('datetime')
-            self.df['continuous_time'] = self.create_continuous_timeline(self.df['datetime'])
-            
-            if self.df.empty:
-                raise ValueError("No data remaining after filtering trading hours")
+            start = self.profiler.now()
+            self.engine.load(data, source=source)
+            self.current_file_path = file_path
+            self.tick_cache = {}
             
-            # Update UI elements
-            self.date_picker.setDate(self.df.iloc[0]['datetime'].date())
-            self.candle_slider.setMaximum(len(self.df))
-            self.candle_slider.setValue(1)
-            self.current_idx = 0
+            # Start on the selected timeframe, or on the file's own one if
+            # the selection can't be built from it
+            minutes = TIMEFRAMES[self.timeframe_combo.currentText()]
+            if self.engine.timeframe(minutes) is None:
+                minutes = self.engine.base_minutes
+                self.sync_timeframe_combo(minutes)
+            start = self.profiler.lap('load.timeframe', start)
+            self.show_timeframe(minutes, 0)
+            self.profiler.lap('load.show', start)
             
             # Update file path label
             file_name = os.path.basename(file_path)
             self.file_path_label.setText(f"✅ Loaded: {file_name}")
             self.file_path_label.setStyleSheet("color: green; font-size: 9px; padding: 2px;")
             
-            self.update_statistics()
-            self.update_chart()
-            
-        except FileNotFoundError:
+        except Exception as e:
+            self.load_failed(file_path, e)
+
+    def load_failed(self, file_path, error):
+        if isinstance(error, FileNotFoundError):
             self.stats_label.setText(f"❌ Error: File not found<br>{file_path}")
             self.file_path_label.setText(f"❌ File not found")
+        else:
+            self.stats_label.setText(f"❌ Error loading file:<br>{str(error)}")
+            self.file_path_label.setText(f"❌ Error: {str(error)[:50]}")
+        self.file_path_label.setStyleSheet("color: red; font-size: 9px; padding: 2px;")
+
+    def closeEvent(self, event):
+        """Stop background work before the window goes away"""
+        self.cancel_load()
+        for thread in list(self.load_threads):
+            thread.wait()
+        self.stop_feed()
+        super().closeEvent(event)
+
+    def show_timeframe(self, minutes, current_idx=None):
+        """Replay one timeframe of the loaded file from the given candle
+        (or from the one the replay is at)"""
+        level = self.engine.set_timeframe(minutes, current_idx)
+        current_idx = self.current_idx
+        self.time_ticks = self.axis_ticks(minutes, level)
+        self.tick_key = None
+        self.drawn_window = None
+        self.update_data_range()
+        self.date_picker.blockSignals(True)
+        self.date_picker.setDate(self.data.datetime_at(current_idx).date())
+        self.date_picker.blockSignals(False)
+        self.update_chart()
+
+    def axis_ticks(self, minutes, level):
+        """Cached TimeAxisTicks of a timeframe, extended to its current data"""
+        ticks = self.tick_cache.get(minutes)
+        if ticks is None:
+            with self.profiler.span('timeframe.ticks'):
+                ticks = self.tick_cache[minutes] = TimeAxisTicks(level.data, level.timeline)
+        else:
+            ticks.extend(level.data, level.timeline)
+        return ticks
+
+    def update_data_range(self):
+        """Fit the date picker, slider and statistics to the replayed data
+        without any of them redrawing the chart"""
+        first_date = self.data.datetime_at(0).date()
+        self.date_picker.blockSignals(True)
+        self.date_picker.setDateRange(first_date, self.data.datetime_at(len(self.data) - 1).date())
+        self.date_picker.blockSignals(False)
+        self.candle_slider.blockSignals(True)
+        self.candle_slider.setMaximum(len(self.data))
+        self.candle_slider.setValue(self.current_idx + 1)
+        self.candle_slider.blockSignals(False)
+        self.update_statistics()
+
+    def toggle_follow(self):
+        """Start or stop following the loaded CSV file"""
+        if not self.follow_check.isChecked():
+            self.follow_timer.stop()
+            return
+        try:
+            self.engine.follow()
+        except ValueError as e:
+            self.stop_follow()
+            self.file_path_label.setText(f"⚠️ {e}")
+            self.file_path_label.setStyleSheet("color: #d35400; font-size: 9px; padding: 2px;")
+            return
+        self.follow_timer.start(1000)
+
+    def stop_follow(self):
+        self.follow_timer.stop()
+        self.follow_check.blockSignals(True)
+        self.follow_check.setChecked(False)
+        self.follow_check.blockSignals(False)
+
+    def poll_file(self):
+        """Add rows appended to the followed file, staying on the newest candle
+        if the replay was there"""
+        at_end = self.current_idx >= len(self.data) - 1
+        try:
+            added = self.engine.poll()
+        except (OSError, ValueError) as e:
+            self.stop_follow()
+            self.file_path_label.setText(f"❌ Stopped following: {str(e)[:50]}")
             self.file_path_label.setStyleSheet("color: red; font-size: 9px; padding: 2px;")
-        except Exception as e:
-            self.stats_label.setText(f"❌ Error loading file:<br>{str(e)}")
-            self.file_path_label.setText(f"❌ Error: {str(e)[:50]}")
-            self.file_path_label.setStyleSheet("color: red; font-size: 9px; padding: 2px;")
+            return
+        if added:
+            self.data_extended(at_end)
+
+    def data_extended(self, at_end):
+        """Catch up with candles added to the replayed data, staying on the
+        newest one if the replay was there"""
+        # Axis labels of other timeframes catch up when they are shown
+        self.time_ticks = self.axis_ticks(self.engine.current_minutes, self.engine.level)
+        self.tick_key = None
+        self.update_data_range()
+        if at_end:
+            self.engine.seek(len(self.data) - 1)
+
+    def toggle_feed(self):
+        """Connect to the tick source in the feed box, or disconnect"""
+        if self.feed is not None:
+            self.stop_feed()
+            return
+        url = self.feed_edit.text().strip()
+        if not url:
+            return
+        # Ticks are built into bars of the loaded data's length, so every
+        # timeframe can still be resampled from them
+        if self.data is not None:
+            minutes = self.engine.base_minutes
+        else:
+            minutes = TIMEFRAMES[self.timeframe_combo.currentText()]
+        self.feed = TickFeed(url, minutes, self.local_tz, sessions=self.sessions)
+        self.feed.start()
+        self.feed_timer.start(100)
+        self.feed_button.setText("⏹ Disconnect Feed")
+
+    def stop_feed(self):
+        self.feed_timer.stop()
+        if self.feed is not None:
+            self.feed.stop()
+        self.feed = None
+        self.feed_button.setText("🔌 Connect Feed")
+
+    def drain_feed(self):
+        """Add the bars the feed produced since the last call (GUI thread, never blocks)"""
+        feed = self.feed
+        running = feed.is_running()  # Checked first so the last bars are still drained
+        bars, forming = feed.drain()
+        if forming is not None:
+            bars.append(forming)
+        
+        had_data = self.data is not None
+        at_end = had_data and self.current_idx >= len(self.data) - 1
+        updated = False
+        for bar in bars:
+            updated |= self.engine.update_bar(bar, feed.aggregator.minutes)
+        if updated:
+            if not had_data:
+                self.tick_cache = {}
+                self.sync_timeframe_combo(feed.aggregator.minutes)
+                self.show_timeframe(feed.aggregator.minutes, 0)
+            else:
+                self.data_extended(at_end)
+        
+        stats = feed.stats()
+        status = (f"Ticks: {stats['ticks']:,}  Late: {stats['late_ticks']:,}  Bars: {stats['bars']:,}  "
+                  f"Queue: {stats['queue']} (max {stats['max_queue']})  "
+                  f"Blocked: {stats['blocked_ns'] / 1e6:,.0f} ms")
+        if not running:
+            status = (f"Feed ended: {feed.error}<br>" if feed.error else "Feed ended<br>") + status
+            self.stop_feed()
+        self.feed_label.setText(status)
+
+    def sync_timeframe_combo(self, minutes):
+        """Show a timeframe in the selector without switching to it"""
+        for timeframe, timeframe_minutes in TIMEFRAMES.items():
+            if timeframe_minutes == minutes:
+                self.timeframe_combo.blockSignals(True)
+                self.timeframe_combo.setCurrentText(timeframe)
+                self.timeframe_combo.blockSignals(False)
+
+    def change_timeframe(self):
+        """Switch to the selected timeframe, built from the loaded file"""
+        if self.data is None:
+            return
+        timeframe = self.timeframe_combo.currentText()
+        minutes = TIMEFRAMES[timeframe]
+        if self.engine.timeframe(minutes) is None:
+            self.file_path_label.setText(f"⚠️ {timeframe} can't be built from {self.engine.base_minutes}min data")
+            self.file_path_label.setStyleSheet("color: #d35400; font-size: 9px; padding: 2px;")
+            self.sync_timeframe_combo(self.engine.current_minutes)
+            return
+        
+        # Stay on the bar holding the base candle the replay is currently at
+        self.show_timeframe(minutes)
 
     def update_button_states(self):
         """Update button appearance based on state"""
@@ -605,312 +1533,223 @@ class CandleReplay(QWidget):
         self.macd_slow = self.macd_slow_spin.value()
         self.macd_signal = self.macd_signal_spin.value()
         
-        if self.df is not None:
+        # Drop cached arrays only for indicators whose parameters changed
+        self.engine.set_params(self.indicator_params())
+        
+        if self.data is not None:
             self.update_chart()
 
+    def indicator_params(self):
+        """Current parameters of every indicator, keyed by indicator name"""
+        return {
+            'ema': (self.ema_period,),
+            'sma': (self.sma_period,),
+            'bollinger': (self.bb_period, self.bb_std),
+            'rsi': (self.rsi_period,),
+            'macd': (self.macd_fast, self.macd_slow, self.macd_signal),
+        }
+
+    def indicator_window(self, name):
+        """Slice of a full-series indicator for the visible window"""
+        return self.engine.indicator_window(name, *self.visible_range)
+
     def update_statistics(self):
         """Update statistics display"""
-        if self.df is None or len(self.df) == 0:
+        if self.data is None or len(self.data) == 0:
             return
-            
+        
+        summary = self.data.summary()
         stats_text = f"<b>Data Summary:</b><br>"
-        stats_text += f"Total Candles: {len(self.df)}<br>"
+        stats_text += f"Total Candles: {len(self.data)}<br>"
         stats_text += f"<br><b>Price Range:</b><br>"
-        stats_text += f"High: {self.df['high'].max():.2f}<br>"
-        stats_text += f"Low: {self.df['low'].min():.2f}<br>"
+        stats_text += f"High: {summary['high']:.2f}<br>"
+        stats_text += f"Low: {summary['low']:.2f}<br>"
         
-        if 'volume' in self.df.columns:
+        if 'volume_total' in summary:
             stats_text += f"<br><b>Volume:</b><br>"
-            stats_text += f"Total: {self.df['volume'].sum():,.0f}<br>"
-            stats_text += f"Avg: {self.df['volume'].mean():,.0f}"
+            stats_text += f"Total: {summary['volume_total']:,.0f}<br>"
+            stats_text += f"Avg: {summary['volume_mean']:,.0f}"
         
         self.stats_label.setText(stats_text)
         
         # Update date range display
-        start_date = self.df.iloc[0]['datetime'].strftime('%d-%m-%Y')
-        end_date = self.df.iloc[-1]['datetime'].strftime('%d-%m-%Y')
+        start_date = self.data.datetime_at(0).strftime('%d-%m-%Y')
+        end_date = self.data.datetime_at(len(self.data) - 1).strftime('%d-%m-%Y')
         date_range_text = f"📅 <b>Data Range:</b><br>{start_date}<br>to<br>{end_date}"
         self.date_range_label.setText(date_range_text)
 
-    def create_continuous_timeline(self, datetimes):
-        datetimes = datetimes.sort_values()
-        continuous_time = []
-        continuous_counter = 0
-        
-        for dt in datetimes:
-            if len(continuous_time) == 0:
-                continuous_time.append(0)
-            else:
-                continuous_time.append(continuous_counter)
-            continuous_counter += 3  # 3 minutes per candle
-        
-        return continuous_time
+    def update_chart(self, incremental=False):
+        """Draw the visible window by updating the persistent plot items in place.
 
-    def update_chart(self):
-        if self.df is None:
+        With incremental=True and the replay ahead of the last frame (by one
+        candle, or a batch of them during fast playback), every series just
+        slides forward and the pane layout is left alone; anything else (seek,
+        file load, settings change) rebuilds it all.
+        """
+        if self.data is None:
             return
-            
-        # Clear all plots
-        self.price_plot.clear()
-        self.volume_plot.clear()
-        self.rsi_plot.clear()
-        self.macd_plot.clear()
-        
-        # Always add crosshair items back after clearing
-        self.price_plot.addItem(self.vline, ignoreBounds=True)
-        self.price_plot.addItem(self.hline, ignoreBounds=True)
-        self.price_plot.addItem(self.hover_label)
-    
-        start_idx = max(0, self.current_idx - self.visible_candle_count + 1)
-        self.visible_df = self.df.iloc[start_idx:self.current_idx + 1].reset_index(drop=True)
+        frame_start = start = self.profiler.now()
     
-        x_values = self.visible_df['continuous_time'].values
+        start_idx, end_idx = self.engine.window(self.visible_candle_count)
         
-        # Show/hide RSI and MACD plots based on checkbox
-        if self.show_rsi:
-            self.rsi_plot.show()
-            self.plot_rsi()
-        else:
-            self.rsi_plot.hide()
-            
-        if self.show_macd:
-            self.macd_plot.show()
-            self.plot_macd()
+        if incremental and self.drawn_window is not None:
+            drawn_start, drawn_end = self.drawn_window
+            incremental = end_idx > drawn_end and start_idx >= drawn_start
         else:
-            self.macd_plot.hide()
+            incremental = False
         
-        # Update the layout
-        self.update_chart_layout()
+        self.visible_range = (start_idx, end_idx)
+        
+        # Per-frame arrays shared by drawing and the hover tooltip
+        self.frame_arrays = self.data.arrays(start_idx, end_idx)
+        self.frame_x = self.timeline.x_range(start_idx, end_idx)
+        self.hover_series = []
+        self.hover_idx = None
+    
+        x_values = self.frame_x
+        self.frame_draws = []
+        self.set_detail(start_idx, end_idx,
+                        self.engine.level.pyramid.level_for(end_idx - start_idx, self.detail_px()))
+        start = self.profiler.lap('chart.window', start)
+        
+        if not incremental:
+            # Show/hide RSI, MACD and basis plots based on checkbox
+            self.set_pane_visible(self.rsi_plot, self.show_rsi)
+            self.set_pane_visible(self.macd_plot, self.show_macd)
+            self.set_pane_visible(self.basis_plot, bool(self.instrument_panes) and self.basis_check.isChecked())
+            
+            # Update the layout
+            self.update_chart_layout()
+            start = self.profiler.lap('chart.layout', start)
         
         # Plot price indicators
-        min_price = self.visible_df['low'].min()
-        max_price = self.visible_df['high'].max()
+        min_price = np.nanmin(self.frame_arrays['low'])
+        max_price = np.nanmax(self.frame_arrays['high'])
         price_buffer = (max_price - min_price) * 0.05
 
         # Plot indicators on price chart
-        if self.show_vwap and 'vwap' in self.visible_df.columns:
-            vwap_line = pg.PlotCurveItem(
-                x=x_values,
-                y=self.visible_df['vwap'].values,
-                pen=pg.mkPen('k', width=2, style=Qt.DotLine),
-                symbol='o',
-                symbolSize=4,
-                symbolPen='k',
-                symbolBrush='k',
-                name="VWAP"
-            )
-            self.price_plot.addItem(vwap_line)
-        
-        if self.show_ema and len(self.visible_df) >= self.ema_period:
-            ema = self.visible_df['close'].ewm(span=self.ema_period, adjust=False).mean().values
-            ema_line = pg.PlotCurveItem(
-                x=x_values,
-                y=ema,
-                pen=pg.mkPen('b', width=2),
-                name=f"EMA {self.ema_period}"
-            )
-            self.price_plot.addItem(ema_line)
-        
-        if self.show_sma and len(self.visible_df) >= self.sma_period:
-            sma = self.visible_df['close'].rolling(window=self.sma_period).mean().values
-            sma_line = pg.PlotCurveItem(
-                x=x_values,
-                y=sma,
-                pen=pg.mkPen('orange', width=2),
-                name=f"SMA {self.sma_period}"
-            )
-            self.price_plot.addItem(sma_line)
+        if self.show_vwap and 'vwap' in self.frame_arrays:
+            vwap = self.frame_arrays['vwap']
+            # VWAP restarts every session, so the line breaks between days
+            connect = np.ones(len(vwap), dtype=np.int32)
+            day_starts = np.asarray(self.data.day_starts)
+            day_starts = day_starts[(day_starts > start_idx) & (day_starts < end_idx)]
+            connect[day_starts - start_idx - 1] = 0
+            self.frame_draw(self.draw_series, self.vwap_curve, vwap, connect)
+        else:
+            self.set_series(self.vwap_curve, False)
         
-        if self.show_bollinger and len(self.visible_df) >= self.bb_period:
-            sma = self.visible_df['close'].rolling(window=self.bb_period).mean()
-            std = self.visible_df['close'].rolling(window=self.bb_period).std()
-            upper_band = sma + (std * self.bb_std)
-            lower_band = sma - (std * self.bb_std)
-            
-            self.price_plot.plot(x_values, upper_band.values, pen=pg.mkPen('purple', width=1, style=Qt.DashLine))
-            self.price_plot.plot(x_values, sma.values, pen=pg.mkPen('purple', width=1))
-            self.price_plot.plot(x_values, lower_band.values, pen=pg.mkPen('purple', width=1, style=Qt.DashLine))
+        if self.show_ema:
+            ema = self.indicator_window('ema')
+            self.frame_draw(self.draw_series, self.ema_curve, ema)
+            self.hover_series.append((f"EMA({self.ema_period})", ema))
+        else:
+            self.set_series(self.ema_curve, False)
+        
+        if self.show_sma:
+            sma = self.indicator_window('sma')
+            self.frame_draw(self.draw_series, self.sma_curve, sma)
+            self.hover_series.append((f"SMA({self.sma_period})", sma))
+        else:
+            self.set_series(self.sma_curve, False)
+        
+        if self.show_bollinger:
+            upper_band, middle_band, lower_band = self.indicator_window('bollinger')
+            self.frame_draw(self.draw_series, self.bb_upper_curve, upper_band)
+            self.frame_draw(self.draw_series, self.bb_mid_curve, middle_band)
+            self.frame_draw(self.draw_series, self.bb_lower_curve, lower_band)
+        else:
+            for curve in (self.bb_upper_curve, self.bb_mid_curve, self.bb_lower_curve):
+                self.set_series(curve, False)
+        start = self.profiler.lap('chart.indicators', start)
+    
+        # Plot RSI and MACD panes
+        if self.show_rsi:
+            self.plot_rsi()
+        if self.show_macd:
+            self.plot_macd()
+        start = self.profiler.lap('chart.panes', start)
+        
+        # All instruments are drawn in this same pass
+        if self.instrument_panes:
+            self.plot_instruments(start_idx, end_idx)
+            start = self.profiler.lap('chart.instruments', start)
     
         # Plot candles
-        if self.visible_candle_count > 300 and self.optimize_check.isChecked():
-            self.plot_with_arrays(self.visible_df, x_values)
+        self.frame_draw(self.draw_candles, self.candles, self.frame_arrays['open'], self.frame_arrays['high'],
+                        self.frame_arrays['low'], self.frame_arrays['close'])
+        start = self.profiler.lap('chart.candles', start)
+        
+        # Plot volume
+        if 'volume' in self.frame_arrays and len(x_values) > 0:
+            volume = self.frame_arrays['volume']
+            self.frame_draw(self.draw_volume, volume, self.frame_arrays['close'] < self.frame_arrays['open'])
         else:
-            self.plot_individual_candles(self.visible_df, x_values)
-        
-        # Plot volume - FIXED: Ensure volume always plots
-        if 'volume' in self.visible_df.columns and len(self.visible_df['volume']) > 0:
-            colors = ['g' if self.visible_df.iloc[i]['close'] >= self.visible_df.iloc[i]['open'] else 'r' 
-                     for i in range(len(self.visible_df))]
-            
-            # Create volume bars
-            volume_bars = pg.BarGraphItem(
-                x=x_values,
-                height=self.visible_df['volume'].values,
-                width=2.5,
-                brushes=colors,
-                pens=colors
-            )
-            self.volume_plot.addItem(volume_bars)
-            
-            # Set volume Y-range
-            if len(self.visible_df['volume']) > 0:
-                max_vol = self.visible_df['volume'].max()
-                if max_vol > 0:
-                    self.volume_plot.setYRange(0, max_vol * 1.1, padding=0)
+            self.volume_bars.hide()
+        start = self.profiler.lap('chart.volume', start)
     
         # Auto-scale Y-axis with buffer
         self.price_plot.setYRange(min_price - price_buffer, max_price + price_buffer)
                 
         # Set X-axis range
         if len(x_values) > 0:
-            view_start = x_values[0] - 15
-            view_end = x_values[-1] + 15
-            self.price_plot.setXRange(view_start, view_end, padding=0)
+            self.price_plot.setXRange(*self.view_x_range(x_values), padding=0)
+        start = self.profiler.lap('chart.ranges', start)
 
-        self.create_custom_ticks(self.visible_df)
-        self.update_info_label(self.visible_df)
+        self.update_ticks()
+        start = self.profiler.lap('chart.ticks', start)
+        self.update_info_label()
+        self.profiler.lap('chart.info_label', start)
         
-        # Force update of the layout
-        self.graphics_layout.updateGeometry()
+        self.drawn_window = (start_idx, end_idx)
+        
+        if not incremental:
+            # Force update of the layout
+            self.graphics_layout.updateGeometry()
+        self.profiler.lap('update_chart', frame_start)
 
     def plot_rsi(self):
         """Plot RSI indicator"""
-        if len(self.visible_df) < self.rsi_period + 1:
-            return
-            
-        # Calculate RSI
-        delta = self.visible_df['close'].diff()
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        
-        avg_gain = gain.rolling(window=self.rsi_period, min_periods=self.rsi_period).mean()
-        avg_loss = loss.rolling(window=self.rsi_period, min_periods=self.rsi_period).mean()
-        
-        rs = avg_gain / avg_loss.replace(0, np.nan)
-        rsi = 100 - (100 / (1 + rs))
-        
-        x_values = self.visible_df['continuous_time'].values
+        rsi = self.indicator_window('rsi')
         
         # Plot RSI line
-        self.rsi_plot.plot(x_values, rsi.values, pen=pg.mkPen('purple', width=2), name=f'RSI({self.rsi_period})')
-        
-        # Add overbought/oversold lines
-        overbought_line = pg.InfiniteLine(pos=70, angle=0, pen=pg.mkPen('r', width=1, style=Qt.DashLine))
-        oversold_line = pg.InfiniteLine(pos=30, angle=0, pen=pg.mkPen('g', width=1, style=Qt.DashLine))
-        self.rsi_plot.addItem(overbought_line)
-        self.rsi_plot.addItem(oversold_line)
+        self.frame_draw(self.draw_series, self.rsi_curve, rsi)
+        self.hover_series.append((f"RSI({self.rsi_period})", rsi))
         
         # Set RSI Y-range
         self.rsi_plot.setYRange(0, 100, padding=0.1)
 
     def plot_macd(self):
         """Plot MACD indicator"""
-        if len(self.visible_df) < max(self.macd_fast, self.macd_slow):
-            return
-            
-        # Calculate MACD
-        exp1 = self.visible_df['close'].ewm(span=self.macd_fast, adjust=False).mean()
-        exp2 = self.visible_df['close'].ewm(span=self.macd_slow, adjust=False).mean()
-        macd = exp1 - exp2
-        signal = macd.ewm(span=self.macd_signal, adjust=False).mean()
-        histogram = macd - signal
-        
-        x_values = self.visible_df['continuous_time'].values
-        
-        # Plot MACD line
-        self.macd_plot.plot(x_values, macd.values, pen=pg.mkPen('b', width=2), name='MACD')
-        
-        # Plot Signal line
-        self.macd_plot.plot(x_values, signal.values, pen=pg.mkPen('r', width=2), name='Signal')
-        
-        # Plot Histogram
-        colors = ['g' if h >= 0 else 'r' for h in histogram]
-        for i in range(len(x_values)):
-            if i < len(histogram) and not np.isnan(histogram.iloc[i]):
-                bar = pg.BarGraphItem(
-                    x=[x_values[i]],
-                    height=[histogram.iloc[i]],
-                    width=2,
-                    brush=colors[i],
-                    pen=colors[i]
-                )
-                self.macd_plot.addItem(bar)
-        
-        # Add zero line
-        zero_line = pg.InfiniteLine(pos=0, angle=0, pen=pg.mkPen('k', width=1))
-        self.macd_plot.addItem(zero_line)
+        macd, signal, histogram = self.indicator_window('macd')
         
-        # Auto-scale Y-axis for MACD
-        if len(macd) > 0 and len(signal) > 0:
-            combined = pd.concat([macd, signal, histogram])
-            valid_vals = combined.dropna()
-            if len(valid_vals) > 0:
-                min_val = valid_vals.min()
-                max_val = valid_vals.max()
-                buffer = abs(max_val - min_val) * 0.1 if max_val != min_val else 0.1
-                self.macd_plot.setYRange(min_val - buffer, max_val + buffer, padding=0)
-
-    def plot_individual_candles(self, df, x_values):
-        """Plot each candle individually"""
-        for idx, row in df.iterrows():
-            x = x_values[idx]
-            color = 'g' if row['close'] >= row['open'] else 'r'
-            pen = pg.mkPen(color, width=1)
-
-            # Candle body
-            rect_top = max(row['open'], row['close'])
-            rect_bottom = min(row['open'], row['close'])
-            
-            if rect_top != rect_bottom:
-                body = pg.BarGraphItem(
-                    x=[x],
-                    height=[rect_top - rect_bottom],
-                    width=2.5,
-                    y0=rect_bottom,
-                    brush=color,
-                    pen=pen
-                )
-                self.price_plot.addItem(body)
-
-            # Wick
-            wick_pen = pg.mkPen(color, width=1)
-            self.price_plot.plot([x, x], [row['low'], row['high']], pen=wick_pen)
-
-    def plot_with_arrays(self, df, x_values):
-        """Plot using arrays for better performance"""
-        opens = df['open'].values
-        closes = df['close'].values
-        lows = df['low'].values
-        highs = df['high'].values
-        
-        colors = np.where(closes >= opens, 'g', 'r')
-        
-        for x, low, high, color in zip(x_values, lows, highs, colors):
-            self.price_plot.plot([x, x], [low, high], pen=pg.mkPen(color, width=1))
+        # Plot MACD and Signal lines
+        self.frame_draw(self.draw_series, self.macd_curve, macd)
+        self.frame_draw(self.draw_series, self.signal_curve, signal)
+        self.hover_series.append(("MACD", macd))
+        self.hover_series.append(("Signal", signal))
         
-        tops = np.maximum(opens, closes)
-        bottoms = np.minimum(opens, closes)
-        widths = np.full(len(x_values), 2.5)
-        
-        candles = pg.BarGraphItem(
-            x=x_values,
-            height=tops - bottoms,
-            width=widths,
-            y0=bottoms,
-            brush=colors,
-            pen=colors
-        )
-        self.price_plot.addItem(candles)
-
-    def update_info_label(self, visible_df):
-        current_candle = self.df.iloc[self.current_idx]
-        local_time = current_candle['datetime'].astimezone(self.local_tz)
-        info = f"<b>Candle {self.current_idx + 1}/{len(self.df)}:</b> Date: {local_time.strftime('%d-%m-%Y %H:%M:%S %Z')}<br>"
-        info += f"O: {current_candle['open']:.2f}, H: {current_candle['high']:.2f}, "
-        info += f"L: {current_candle['low']:.2f}, C: {current_candle['close']:.2f}"
+        # Plot Histogram (nothing to draw until the signal line has warmed up)
+        self.frame_draw(self.draw_histogram, self.macd_hist, histogram)
         
-        if 'volume' in current_candle and pd.notna(current_candle['volume']):
-            info += f", Vol: {current_candle['volume']:,.0f}"
+        # Auto-scale Y-axis for MACD
+        combined = np.concatenate([macd, signal, histogram])
+        valid_vals = combined[~np.isnan(combined)]
+        if len(valid_vals) > 0:
+            min_val = valid_vals.min()
+            max_val = valid_vals.max()
+            buffer = abs(max_val - min_val) * 0.1 if max_val != min_val else 0.1
+            self.macd_plot.setYRange(min_val - buffer, max_val + buffer, padding=0)
+
+    def update_info_label(self):
+        idx = self.current_idx
+        local_time = self.data.datetime_at(idx).astimezone(self.local_tz)
+        info = f"<b>Candle {idx + 1}/{len(self.data)}:</b> Date: {local_time.strftime('%d-%m-%Y %H:%M:%S %Z')}<br>"
+        info += f"O: {self.data['open'][idx]:.2f}, H: {self.data['high'][idx]:.2f}, "
+        info += f"L: {self.data['low'][idx]:.2f}, C: {self.data['close'][idx]:.2f}"
+        
+        if 'volume' in self.data and pd.notna(self.data['volume'][idx]):
+            info += f", Vol: {self.data['volume'][idx]:,.0f}"
         
         self.info_label.setText(info)
 
@@ -918,42 +1757,27 @@ class CandleReplay(QWidget):
         self.candle_slider.setValue(self.current_idx + 1)
         self.candle_slider.blockSignals(False)
 
-    def create_custom_ticks(self, visible_df):
-        """Create custom time axis labels"""
-        unique_days = visible_df['datetime'].dt.date.unique()
-        major_ticks = []
-        major_labels = []
-        minor_ticks = []
-        minor_labels = []
-        
-        for day_idx, day in enumerate(unique_days):
-            day_df = visible_df[visible_df['datetime'].dt.date == day]
-            if len(day_df) == 0:
-                continue
-            
-            # Major tick at start of day with date
-            open_time = day_df.iloc[0]['continuous_time']
-            major_ticks.append(open_time)
-            major_labels.append(day.strftime('%d-%m-%Y'))
-            
-            # Minor ticks for each candle time
-            for idx, row in day_df.iterrows():
-                tick_pos = row['continuous_time']
-                time_label = row['datetime'].strftime('%H:%M')
-                minor_ticks.append(tick_pos)
-                minor_labels.append(time_label)
-        
-        axis = self.price_plot.getAxis('bottom')
-        axis.setTicks([
-            [(pos, label) for pos, label in zip(major_ticks, major_labels)],
-            [(pos, label) for pos, label in zip(minor_ticks, minor_labels)]
-        ])
-
-    def mouse_moved(self, pos):
-        """Handle mouse movement over chart"""
-        if self.df is None or not hasattr(self, 'visible_df'):
+    def update_ticks(self):
+        """Pick the axis labels for the current x range, only when range or width changed"""
+        if self.time_ticks is None:
             return
-            
+        (x_min, x_max), _ = self.price_plot.viewRange()
+        width = self.price_plot.vb.width()
+        if (x_min, x_max, width) == self.tick_key:
+            return
+        self.tick_key = (x_min, x_max, width)
+        self.price_plot.getAxis('bottom').setTicks(self.time_ticks.ticks(x_min, x_max, width))
+
+    def mouse_moved(self, event):
+        """Handle mouse movement over chart (rate-limited through SignalProxy)"""
+        pos = event[0]
+        if self.data is None or self.visible_range is None:
+            return
+        with self.profiler.span('mouse_moved'):
+            self.move_crosshair(pos)
+
+    def move_crosshair(self, pos):
+        """Move the crosshair and tooltip to a scene position"""
         if self.price_plot.sceneBoundingRect().contains(pos):
             mouse_point = self.price_plot.vb.mapSceneToView(pos)
             x_val = mouse_point.x()
@@ -962,80 +1786,19 @@ class CandleReplay(QWidget):
             self.vline.setValue(x_val)
             self.hline.setValue(y_val)
             
-            # Find closest candle
-            x_values = self.visible_df['continuous_time'].values
-            if len(x_values) == 0:
-                return
-                
-            # Find index of closest x value
-            idx = np.searchsorted(x_values, x_val, side='left')
-            idx = min(max(idx, 0), len(self.visible_df) - 1)
+            # Find closest candle on the timeline
+            start_idx, end_idx = self.visible_range
+            candle_idx = int(self.timeline.index_at_x(x_val))
             
-            # Check if mouse is close enough to a candle
-            if idx < len(x_values) and abs(x_values[idx] - x_val) < 10:
-                candle = self.visible_df.iloc[idx]
-                
-                # Format datetime
-                dt = candle['datetime']
-                date_str = dt.strftime('%d-%m-%Y')
-                time_str = dt.strftime('%H:%M:%S')
-                
-                # Build hover text with all information
-                hover_text = f"<b>Date:</b> {date_str}<br>"
-                hover_text += f"<b>Time:</b> {time_str}<br>"
-                hover_text += f"<b>Open:</b> {candle['open']:.2f}<br>"
-                hover_text += f"<b>High:</b> {candle['high']:.2f}<br>"
-                hover_text += f"<b>Low:</b> {candle['low']:.2f}<br>"
-                hover_text += f"<b>Close:</b> {candle['close']:.2f}<br>"
-                
-                if 'volume' in candle and pd.notna(candle['volume']):
-                    hover_text += f"<b>Volume:</b> {int(candle['volume']):,}<br>"
-                
-                # Add Day High/Low
-                if 'day_high' in candle and 'day_low' in candle:
-                    hover_text += f"<b>Day High:</b> {candle['day_high']:.2f}<br>"
-                    hover_text += f"<b>Day Low:</b> {candle['day_low']:.2f}<br>"
-                
-                # Add VWAP if available
-                if 'vwap' in candle and pd.notna(candle['vwap']):
-                    hover_text += f"<b>VWAP:</b> {candle['vwap']:.2f}<br>"
-                
-                # Calculate and add indicators for this candle
-                if self.show_ema and len(self.visible_df) >= self.ema_period:
-                    ema = self.visible_df['close'].ewm(span=self.ema_period, adjust=False).mean()
-                    if idx < len(ema) and pd.notna(ema.iloc[idx]):
-                        hover_text += f"<b>EMA({self.ema_period}):</b> {ema.iloc[idx]:.2f}<br>"
-                
-                if self.show_sma and len(self.visible_df) >= self.sma_period:
-                    sma = self.visible_df['close'].rolling(window=self.sma_period).mean()
-                    if idx < len(sma) and pd.notna(sma.iloc[idx]):
-                        hover_text += f"<b>SMA({self.sma_period}):</b> {sma.iloc[idx]:.2f}<br>"
-                
-                # Add RSI if enabled
-                if self.show_rsi and len(self.visible_df) >= self.rsi_period + 1:
-                    delta = self.visible_df['close'].diff()
-                    gain = delta.where(delta > 0, 0)
-                    loss = -delta.where(delta < 0, 0)
-                    avg_gain = gain.rolling(window=self.rsi_period, min_periods=self.rsi_period).mean()
-                    avg_loss = loss.rolling(window=self.rsi_period, min_periods=self.rsi_period).mean()
-                    rs = avg_gain / avg_loss.replace(0, np.nan)
-                    rsi = 100 - (100 / (1 + rs))
-                    if idx < len(rsi) and pd.notna(rsi.iloc[idx]):
-                        hover_text += f"<b>RSI({self.rsi_period}):</b> {rsi.iloc[idx]:.2f}<br>"
-                
-                # Add MACD if enabled
-                if self.show_macd and len(self.visible_df) >= max(self.macd_fast, self.macd_slow):
-                    exp1 = self.visible_df['close'].ewm(span=self.macd_fast, adjust=False).mean()
-                    exp2 = self.visible_df['close'].ewm(span=self.macd_slow, adjust=False).mean()
-                    macd = exp1 - exp2
-                    signal = macd.ewm(span=self.macd_signal, adjust=False).mean()
-                    if idx < len(macd) and pd.notna(macd.iloc[idx]):
-                        hover_text += f"<b>MACD:</b> {macd.iloc[idx]:.2f}<br>"
-                        if pd.notna(signal.iloc[idx]):
-                            hover_text += f"<b>Signal:</b> {signal.iloc[idx]:.2f}<br>"
-                
-                # Show the hover label
-                self.hover_label.setHtml(f'<div style="background-color: rgba(255, 255, 255, 220); padding: 8px; border: 1px solid black; border-radius: 3px;">{hover_text}</div>')
+            # Check if mouse is close enough to a visible candle
+            if (start_idx <= candle_idx < end_idx
+                    and abs(self.timeline.x_at_index(candle_idx) - x_val) <= self.timeline.bar_minutes):
+                idx = candle_idx - start_idx
+                # Only rebuild the tooltip when the hovered candle changes
+                if idx != self.hover_idx:
+                    with self.profiler.span('mouse_moved.tooltip'):
+                        self.hover_label.setHtml(self.hover_html(idx))
+                    self.hover_idx = idx
                 self.hover_label.setPos(mouse_point.x(), mouse_point.y())
                 self.hover_label.setVisible(True)
             else:
@@ -1043,15 +1806,52 @@ class CandleReplay(QWidget):
         else:
             self.hover_label.setVisible(False)
 
+    def hover_html(self, idx):
+        """Build the tooltip for one visible candle from the per-frame arrays"""
+        arrays = self.frame_arrays
+        
+        # Format datetime
+        dt = self.data.datetime_at(self.visible_range[0] + idx)
+        date_str = dt.strftime('%d-%m-%Y')
+        time_str = dt.strftime('%H:%M:%S')
+        
+        # Build hover text with all information
+        hover_text = f"<b>Date:</b> {date_str}<br>"
+        hover_text += f"<b>Time:</b> {time_str}<br>"
+        hover_text += f"<b>Open:</b> {arrays['open'][idx]:.2f}<br>"
+        hover_text += f"<b>High:</b> {arrays['high'][idx]:.2f}<br>"
+        hover_text += f"<b>Low:</b> {arrays['low'][idx]:.2f}<br>"
+        hover_text += f"<b>Close:</b> {arrays['close'][idx]:.2f}<br>"
+        
+        if 'volume' in arrays and pd.notna(arrays['volume'][idx]):
+            hover_text += f"<b>Volume:</b> {int(arrays['volume'][idx]):,}<br>"
+        
+        # Add Day High/Low
+        if 'day_high' in arrays and 'day_low' in arrays:
+            hover_text += f"<b>Day High:</b> {arrays['day_high'][idx]:.2f}<br>"
+            hover_text += f"<b>Day Low:</b> {arrays['day_low'][idx]:.2f}<br>"
+        
+        # Add VWAP if available
+        if 'vwap' in arrays and pd.notna(arrays['vwap'][idx]):
+            hover_text += f"<b>VWAP:</b> {arrays['vwap'][idx]:.2f}<br>"
+        
+        # Indicators drawn in this frame
+        for label, values in self.hover_series:
+            if not np.isnan(values[idx]):
+                hover_text += f"<b>{label}:</b> {values[idx]:.2f}<br>"
+        
+        return f'<div style="background-color: rgba(255, 255, 255, 220); padding: 8px; border: 1px solid black; border-radius: 3px;">{hover_text}</div>'
+
     def mouse_clicked(self, event):
         if event.button() == Qt.RightButton:
             self.zoom_fit()
 
+    def on_bar(self, current_idx, incremental):
+        """Redraw whenever the engine's cursor moves"""
+        self.update_chart(incremental=incremental)
+
     def next_candle(self):
-        if self.current_idx < len(self.df) - 1:
-            self.current_idx += 1
-            self.update_chart()
-        else:
+        if self.data is None or not self.engine.step():
             self.timer.stop()
             self.is_playing = False
             self.update_button_states()
@@ -1059,7 +1859,29 @@ class CandleReplay(QWidget):
     def play(self):
         self.is_playing = True
         self.update_button_states()
-        self.timer.start(self.speed)
+        now = time.perf_counter_ns()
+        self.playback_clock.start(now)
+        self.schedule_tick(now)
+
+    def playback_tick(self):
+        """Advance by every bar due since the last frame, with a single redraw"""
+        if not self.is_playing:
+            return
+        now = time.perf_counter_ns()
+        due = self.playback_clock.due(now)
+        if due:
+            with self.profiler.span('playback.tick'):
+                moved = self.engine.advance(due) if self.data is not None else 0
+            if not moved:
+                self.pause()
+                return
+            self.playback_clock.take(due, now)
+            # This frame's update plus the last repaint, which Qt does after we return
+            self.playback_clock.frame_done(time.perf_counter_ns() - now + self.graphics_layout.paint_ns)
+        self.schedule_tick(time.perf_counter_ns())
+
+    def schedule_tick(self, now):
+        self.timer.start(-(-self.playback_clock.next_delay(now) // 1_000_000))  # Rounded up, never early
 
     def pause(self):
         self.is_playing = False
@@ -1070,43 +1892,92 @@ class CandleReplay(QWidget):
         self.timer.stop()
         self.is_playing = False
         self.update_button_states()
-        self.current_idx = 0
-        self.update_chart()
+        self.engine.seek(0)
 
     def update_speed(self):
         self.speed = self.speed_slider.value()
-        if self.timer.isActive():
-            self.timer.start(self.speed)
+        now = time.perf_counter_ns()
+        self.playback_clock.set_interval(self.speed, now)
+        if self.is_playing:
+            self.schedule_tick(now)
 
     def jump_to_date(self):
-        target_date = self.date_picker.date().toPyDate()
-        for idx, row in self.df.iterrows():
-            if row['datetime'].date() >= target_date:
-                self.current_idx = idx
-                self.update_chart()
-                break
+        """Jump to the first candle on or after the picked date"""
+        if self.data is None:
+            return
+        self.engine.seek_date(self.date_picker.date().toPyDate())
+
+    def next_day(self):
+        if self.data is not None:
+            self.engine.seek_day(self.engine.current_day() + 1)
+
+    def previous_day(self):
+        if self.data is not None:
+            self.engine.seek_day(self.engine.current_day() - 1)
+
+    def session_open(self):
+        if self.data is not None:
+            self.engine.seek_day(self.engine.current_day())
 
     def jump_to_candle(self):
-        self.current_idx = self.candle_slider.value() - 1
-        self.update_chart()
+        if self.data is not None:
+            self.engine.seek(self.candle_slider.value() - 1)
 
     def update_candle_count(self):
         self.visible_candle_count = self.candle_count_spin.value()
         self.update_chart()
 
+    def toggle_profiling(self):
+        """Record stage timings and show them over the chart, or stop"""
+        enabled = self.profile_check.isChecked()
+        self.profiler.enabled = enabled
+        self.trace_button.setEnabled(enabled or self.profiler.count > 0)
+        if enabled:
+            self.profile_timer.start(500)
+            self.update_profile_overlay()
+            self.profile_label.show()
+        else:
+            self.profile_timer.stop()
+            self.profile_label.hide()
+
+    def update_profile_overlay(self):
+        """Show frames per second and the mean time of each stage over the last second"""
+        summary = self.profiler.summary()
+        paints = summary.get('paint', (0, 0.0, 0.0))[0]
+        charts = summary.get('update_chart', (0, 0.0, 0.0))[0]
+        lines = [f"<b>{paints} fps</b> &nbsp;{charts} chart updates/s", "stage ms: mean / max"]
+        for name, (count, mean_ms, max_ms) in sorted(summary.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name}: {mean_ms:.2f} / {max_ms:.2f}")
+        self.profile_label.setText("<br>".join(lines))
+        self.profile_label.adjustSize()
+
+    def save_trace(self):
+        """Write the recorded spans as a Chrome trace file"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Trace", "replay_trace.json", "Chrome Trace (*.json);;All Files (*)")
+        if not file_path:
+            return
+        try:
+            count = self.profiler.dump(file_path)
+        except OSError as e:
+            self.stats_label.setText(f"❌ Error saving trace:<br>{e}")
+            return
+        self.stats_label.setText(f"✅ Saved {count} trace events:<br>{file_path}")
+
     def zoom_fit(self):
         """Zoom to fit all visible candles"""
-        start_idx = max(0, self.current_idx - self.visible_candle_count + 1)
-        visible_df = self.df.iloc[start_idx:self.current_idx + 1]
+        if self.data is None:
+            return
+        start_idx, end_idx = self.engine.window(self.visible_candle_count)
         
-        if len(visible_df) == 0:
+        x_values = self.timeline.x_range(start_idx, end_idx)
+        if len(x_values) == 0:
             return
             
-        x_min = visible_df['continuous_time'].iloc[0] - 15
-        x_max = visible_df['continuous_time'].iloc[-1] + 15
+        x_min, x_max = self.view_x_range(x_values)
         
-        y_min = visible_df['low'].min()
-        y_max = visible_df['high'].max()
+        y_min = self.data['low'][start_idx:end_idx].min()
+        y_max = self.data['high'][start_idx:end_idx].max()
         buffer = (y_max - y_min) * 0.05
         
         self.price_plot.setXRange(x_min, x_max, padding=0)
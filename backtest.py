@@ -0,0 +1,285 @@
+"""
+Vectorized backtests over the replay data.
+
+Entry and exit rules are expressions over the candle columns and the
+replay's indicators, evaluated as whole-array NumPy operations, e.g.
+
+    crosses_above(close, ema(20)) and rsi(14) < 70
+
+Names: any data column (open, high, low, close, volume, vwap, day_high,
+day_low, ...); ema(period), sma(period), rsi(period),
+bb_upper/bb_mid/bb_lower(period, std),
+macd/macd_signal/macd_hist(fast, slow, signal), where a bare name such as
+`ema` uses the replay's current parameters; crosses_above(a, b) and
+crosses_below(a, b). Operators: arithmetic, comparisons, and/or/not.
+
+Run from the command line with:
+
+    python backtest.py data/nifty_15min.csv --entry "close > ema(20)" --exit "close < ema(20)"
+"""
+
+
+import argparse
+import ast
+
+import numpy as np
+import pandas as pd
+
+from data_loader import TradingSessions, DEFAULT_SESSIONS
+from replay_engine import ReplayEngine
+
+
+# Rule name -> (indicator, index into its result tuple or None)
+RULE_INDICATORS = {
+    'ema': ('ema', None),
+    'sma': ('sma', None),
+    'rsi': ('rsi', None),
+    'bb_upper': ('bollinger', 0),
+    'bb_mid': ('bollinger', 1),
+    'bb_lower': ('bollinger', 2),
+    'macd': ('macd', 0),
+    'macd_signal': ('macd', 1),
+    'macd_hist': ('macd', 2),
+}
+
+BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+}
+
+COMPARE_OPS = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+# Keys of BacktestResult.summary(), in order
+SUMMARY_COLUMNS = ('trades', 'win_rate', 'total_pnl', 'avg_pnl', 'profit_factor', 'max_drawdown')
+
+
+def crosses_above(a, b):
+    """True on the candle where `a` moves from at or below `b` to above it"""
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    above = a > b
+    result = np.zeros(len(above), dtype=bool)
+    result[1:] = above[1:] & (a[:-1] <= b[:-1])
+    return result
+
+
+def crosses_below(a, b):
+    """True on the candle where `a` moves from at or above `b` to below it"""
+    return crosses_above(-np.asarray(a, dtype=float), -np.asarray(b, dtype=float))
+
+
+class RuleEvaluator:
+    """Evaluate a rule expression to a boolean array over a replay's data"""
+
+    FUNCTIONS = {'crosses_above': crosses_above, 'crosses_below': crosses_below}
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def evaluate(self, expression):
+        tree = ast.parse(expression, mode='eval')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = self.visit(tree.body)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (len(self.engine),))
+
+    def indicator(self, name, params):
+        indicator, part = RULE_INDICATORS[name]
+        params = tuple(params) or self.engine.params[indicator]
+        result = self.engine.indicators.get(indicator, *params)
+        return result if part is None else result[part]
+
+    def visit(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in self.engine.data:
+                return np.asarray(self.engine.data[node.id], dtype=float)
+            if node.id in RULE_INDICATORS:
+                return self.indicator(node.id, ())
+            raise ValueError(f"Unknown name in rule: {node.id}")
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name in RULE_INDICATORS:
+                return self.indicator(name, [self.constant(arg) for arg in node.args])
+            if name in self.FUNCTIONS:
+                return self.FUNCTIONS[name](*[self.visit(arg) for arg in node.args])
+            raise ValueError(f"Unknown function in rule: {name}")
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self.visit(node.values[0])
+            for value in node.values[1:]:
+                result = combine(result, self.visit(value))
+            return result
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return np.logical_not(self.visit(node.operand))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return np.negative(self.visit(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            return BINARY_OPS[type(node.op)](self.visit(node.left), self.visit(node.right))
+        if isinstance(node, ast.Compare):
+            # Chained comparisons: a < b < c means a < b and b < c
+            result = True
+            left = self.visit(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                if type(op) not in COMPARE_OPS:
+                    break
+                right = self.visit(comparator)
+                result = np.logical_and(result, COMPARE_OPS[type(op)](left, right))
+                left = right
+            else:
+                return result
+        raise ValueError(f"Unsupported rule syntax: {ast.dump(node)}")
+
+    def constant(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        raise ValueError("Indicator parameters in rules must be numbers")
+
+
+class BacktestResult:
+    """Trades, per-candle equity and summary statistics of one backtest"""
+
+    def __init__(self, trades, equity):
+        self.trades = trades
+        self.equity = equity
+        # Distance below the best equity so far, starting from zero
+        self.drawdown = equity - np.maximum.accumulate(np.maximum(equity, 0.0))
+
+    def summary(self):
+        pnl = self.trades['pnl'].to_numpy()
+        wins = pnl[pnl > 0]
+        losses = pnl[pnl < 0]
+        return {
+            'trades': len(pnl),
+            'win_rate': float(len(wins) / len(pnl)) if len(pnl) else 0.0,
+            'total_pnl': float(pnl.sum()),
+            'avg_pnl': float(pnl.mean()) if len(pnl) else 0.0,
+            'profit_factor': float(wins.sum() / -losses.sum()) if len(losses) else float('inf') if len(wins) else 0.0,
+            'max_drawdown': float(self.drawdown.min()) if len(self.drawdown) else 0.0,
+        }
+
+
+def positions(entries, exits, last_bar_of_day=None):
+    """1 while a trade is held after a candle's close, 0 while flat.
+
+    A trade opens on an entry candle and closes on the next exit candle
+    (an exit wins when both fire); with last_bar_of_day given, trades are
+    also closed on, and never opened on, each day's last candle. The last
+    candle always ends flat.
+    """
+    exits = exits.copy()
+    entries = entries & ~exits
+    if last_bar_of_day is not None:
+        exits |= last_bar_of_day
+        entries &= ~last_bar_of_day
+    if len(exits):
+        exits[-1] = True
+        entries[-1] = False
+
+    # Forward-fill the last signal: 1 after an entry, 0 after an exit
+    signal = np.where(entries, 1, 0)
+    has_signal = entries | exits
+    last = np.maximum.accumulate(np.where(has_signal, np.arange(len(signal)), -1))
+    return np.where(last >= 0, signal[np.maximum(last, 0)], 0)
+
+
+def run_backtest(engine, entry, exit, direction=1, fill='close', intraday=False, cost=0.0):
+    """Backtest entry/exit rules over the engine's current timeframe.
+
+    direction is 1 for long and -1 for short trades. fill='close' trades at
+    the close of the signal candle, fill='next_open' at the next candle's
+    open (exits forced at a day's end or the data's end still fill at that
+    candle's close). cost is deducted from every trade, in points.
+    """
+    if fill not in ('close', 'next_open'):
+        raise ValueError(f"Unknown fill: {fill}")
+    data = engine.data
+    n = len(data)
+    evaluator = RuleEvaluator(engine)
+    entries = evaluator.evaluate(entry).copy()
+    exits = evaluator.evaluate(exit).copy()
+
+    last_bar_of_day = None
+    if intraday:
+        last_bar_of_day = np.zeros(n, dtype=bool)
+        last_bar_of_day[np.append(np.asarray(data.day_starts[1:]) - 1, n - 1)] = True
+
+    held = positions(entries, exits, last_bar_of_day)
+    change = np.diff(held, prepend=0)
+    entry_bars = np.flatnonzero(change > 0)
+    exit_bars = np.flatnonzero(change < 0)
+
+    opens = np.asarray(data['open'], dtype=float)
+    closes = np.asarray(data['close'], dtype=float)
+    if fill == 'close':
+        entry_fill, exit_fill = entry_bars, exit_bars
+        entry_price, exit_price = closes[entry_fill], closes[exit_fill]
+    else:
+        forced = exit_bars == n - 1
+        if last_bar_of_day is not None:
+            forced |= last_bar_of_day[exit_bars]
+        entry_fill = entry_bars + 1
+        exit_fill = np.where(forced, exit_bars, exit_bars + 1)
+        entry_price = opens[entry_fill]
+        exit_price = np.where(forced, closes[exit_bars], opens[np.minimum(exit_bars + 1, n - 1)])
+    pnl = direction * (exit_price - entry_price) - cost
+
+    # Equity: realised P&L of closed trades plus the open trade marked at each close
+    equity = np.cumsum(np.bincount(exit_fill, weights=pnl, minlength=n))
+    if len(pnl):
+        # Latest trade entered at or before each candle
+        trade = np.cumsum(np.bincount(entry_fill, minlength=n)) - 1
+        latest = np.maximum(trade, 0)
+        is_open = (trade >= 0) & (np.arange(n) < exit_fill[latest])
+        equity += np.where(is_open, direction * (closes - entry_price[latest]), 0.0)
+
+    epoch = np.asarray(data['epoch'])
+    trades = pd.DataFrame({
+        'entry_time': pd.to_datetime(epoch[entry_fill], unit='ns', utc=True).tz_convert(data.tz),
+        'exit_time': pd.to_datetime(epoch[exit_fill], unit='ns', utc=True).tz_convert(data.tz),
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'bars': exit_fill - entry_fill,
+        'pnl': pnl,
+    })
+    return BacktestResult(trades, equity)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest entry/exit rules over an OHLCV file")
+    parser.add_argument('data', help="CSV file or OHLCV store")
+    parser.add_argument('--entry', required=True, help="entry rule, e.g. \"crosses_above(close, ema(20))\"")
+    parser.add_argument('--exit', required=True, help="exit rule, e.g. \"crosses_below(close, ema(20))\"")
+    parser.add_argument('--timeframe', type=int, default=None, help="bar length in minutes (default: the file's own)")
+    parser.add_argument('--sessions', default=None, help="JSON file of trading sessions to keep (default: 09:15-15:30)")
+    parser.add_argument('--short', action='store_true', help="trade short instead of long")
+    parser.add_argument('--fill', choices=('close', 'next_open'), default='close', help="fill price of signals")
+    parser.add_argument('--intraday', action='store_true', help="close every trade at the day's last candle")
+    parser.add_argument('--cost', type=float, default=0.0, help="cost per trade in points")
+    parser.add_argument('--trades', action='store_true', help="print every trade")
+    args = parser.parse_args()
+
+    engine = ReplayEngine(sessions=TradingSessions.load(args.sessions) if args.sessions else DEFAULT_SESSIONS)
+    engine.load_file(args.data)
+    minutes = args.timeframe or engine.base_minutes
+    if engine.set_timeframe(minutes, 0) is None:
+        parser.error(f"{minutes}min can't be built from {engine.base_minutes}min data")
+
+    result = run_backtest(engine, args.entry, args.exit, direction=-1 if args.short else 1,
+                          fill=args.fill, intraday=args.intraday, cost=args.cost)
+    if args.trades:
+        print(result.trades.to_string())
+    for name, value in result.summary().items():
+        print(f"{name}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
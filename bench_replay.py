@@ -0,0 +1,292 @@
+"""
+Replay benchmark for the Nifty Replay Tool.
+
+Drives the chart window offscreen through the bundled 15min file and a
+synthetic 1min series, stepping bars with each combination of indicators
+and visible candle count, and reports frame times (step plus repaint),
+scene item counts and peak memory as JSON:
+
+    python bench_replay.py --output before.json
+    ... change the drawing code ...
+    python bench_replay.py --output after.json --compare before.json
+
+--combos single (no indicators, each alone, all of them) gives a quick run.
+"""
+
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Must be set before Qt is loaded
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtWidgets import QApplication
+
+from ohlcv_store import OHLCVStore
+from Replay_Tool import CandleReplay
+
+
+# Next to this script, so the benchmark runs from any directory
+BUNDLED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nifty_15min.csv')
+CANDLE_COUNTS = (100, 300, 1000, 5000, 50000)
+
+# Indicator name -> checkbox of the window that turns it on
+INDICATOR_CHECKS = {
+    'ema': 'ema_check',
+    'sma': 'sma_check',
+    'vwap': 'vwap_check',
+    'bollinger': 'bb_check',
+    'rsi': 'rsi_check',
+    'macd': 'macd_check',
+}
+
+
+def synthetic_frame(days=250, seed=0, tz='Asia/Kolkata', start='2023-01-02'):
+    """Cleaned-looking 1min OHLCV frame: a random walk over `days` weekdays
+    of 09:15-15:29 candles with random volume"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=days)
+    minutes = np.arange(9 * 60 + 15, 15 * 60 + 30)
+    stamps = (dates.values[:, None] + minutes[None, :].astype('timedelta64[m]')).ravel()
+    n = len(stamps)
+
+    close = 18000 + np.cumsum(rng.normal(0, 4, n))
+    opens = np.concatenate(([close[0]], close[:-1])) + rng.normal(0, 1, n)
+    spread = np.abs(rng.normal(0, 3, n))
+    return pd.DataFrame({
+        'datetime': pd.DatetimeIndex(stamps).tz_localize(tz),
+        'open': opens,
+        'high': np.maximum(opens, close) + spread,
+        'low': np.minimum(opens, close) - spread,
+        'close': close,
+        'volume': rng.integers(1_000, 50_000, n),
+    })
+
+
+def indicator_combos(mode):
+    """Tuples of indicator names to benchmark: every subset, or just none,
+    each one alone and all of them"""
+    names = list(INDICATOR_CHECKS)
+    if mode == 'all':
+        return [combo for size in range(len(names) + 1) for combo in itertools.combinations(names, size)]
+    return [()] + [(name,) for name in names] + [tuple(names)]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far in MB, or None if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return windows_peak_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
+def windows_peak_rss_mb():
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                'PagefileUsage', 'PeakPagefileUsage')]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        ok = ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize / 1024**2 if ok else None
+
+
+def revision():
+    """Short git revision of the working tree (with a + when it has changes), or None"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return rev + ('+' if dirty else '')
+
+
+def percentiles(values_ms):
+    p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+    return {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'p99': round(float(p99), 3),
+            'mean': round(float(np.mean(values_ms)), 3), 'max': round(float(np.max(values_ms)), 3)}
+
+
+def set_indicators(window, combo):
+    """Turn on exactly the indicators in `combo`, redrawing once"""
+    for name, check in INDICATOR_CHECKS.items():
+        box = getattr(window, check)
+        box.blockSignals(True)
+        box.setChecked(name in combo)
+        box.blockSignals(False)
+    window.on_indicator_changed()
+
+
+def run_case(app, window, candles, combo, steps, warmup):
+    """Step `steps` bars with `candles` visible and `combo` on; returns the case's results"""
+    # Set directly, as the spin box would redraw on its own
+    window.visible_candle_count = candles
+    set_indicators(window, combo)
+    window.engine.seek(min(candles, len(window.engine) - steps - warmup - 1))
+    app.processEvents()
+
+    frame_ms, update_ms = [], []
+    for i in range(warmup + steps):
+        start = time.perf_counter_ns()
+        window.next_candle()
+        stepped = time.perf_counter_ns()
+        app.processEvents()
+        done = time.perf_counter_ns()
+        if i >= warmup:
+            update_ms.append((stepped - start) / 1e6)
+            frame_ms.append((done - start) / 1e6)
+
+    return {
+        'candles': candles,
+        'indicators': list(combo),
+        'steps': steps,
+        'frame_ms': percentiles(frame_ms),
+        'update_ms': percentiles(update_ms),
+        'scene_items': len(window.graphics_layout.scene().items()),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmark(datasets, counts=CANDLE_COUNTS, combos='all', steps=50, warmup=5,
+                  minutes=None, log=None):
+    """Benchmark every dataset, candle count and indicator combination.
+
+    datasets maps a name to a CSV/store path or to an OHLCVStore, replayed
+    at `minutes` bars (default: each one's own bar length); returns the
+    report as a dict ready for json.dump().
+    """
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = CandleReplay()
+    window.resize(1600, 900)
+    window.show()
+
+    report = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'qt_platform': app.platformName(),
+        'steps': steps,
+        'datasets': {},
+        'cases': [],
+    }
+    for name, source in datasets.items():
+        start = time.perf_counter()
+        if isinstance(source, OHLCVStore):
+            window.finish_load(name, source, None)
+        else:
+            window.load_data_from_file(source, wait=True)
+        if window.data is None:
+            raise RuntimeError(f"Could not load {name}: {window.file_path_label.text()}")
+        bar_minutes = minutes or window.engine.base_minutes
+        if window.engine.timeframe(bar_minutes) is None:
+            raise RuntimeError(f"{bar_minutes}min can't be built from {name}")
+        window.sync_timeframe_combo(bar_minutes)
+        window.show_timeframe(bar_minutes, 0)
+        report['datasets'][name] = {'candles': len(window.engine), 'bar_minutes': window.engine.current_minutes,
+                                    'load_s': round(time.perf_counter() - start, 3)}
+
+        for candles in counts:
+            for combo in indicator_combos(combos):
+                case = run_case(app, window, candles, combo, steps, warmup)
+                case['dataset'] = name
+                report['cases'].append(case)
+                if log:
+                    log(f"{name:>10} {candles:>5} {'+'.join(combo) or '-':<34} "
+                        f"p50 {case['frame_ms']['p50']:7.2f} ms  p99 {case['frame_ms']['p99']:7.2f} ms")
+
+    window.close()
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def case_key(case):
+    return case['dataset'], case['candles'], tuple(case['indicators'])
+
+
+def compare(baseline, report):
+    """Lines comparing frame time percentiles with a baseline report, by case"""
+    before = {case_key(case): case for case in baseline['cases']}
+    lines = [f"{baseline.get('revision')} -> {report.get('revision')}"]
+    for case in report['cases']:
+        old = before.get(case_key(case))
+        if old is None:
+            continue
+        changes = []
+        for stat in ('p50', 'p95', 'p99'):
+            a, b = old['frame_ms'][stat], case['frame_ms'][stat]
+            changes.append(f"{stat} {a:7.2f} -> {b:7.2f} ({(b - a) / a * 100 if a else 0:+6.1f}%)")
+        label = '+'.join(case['indicators']) or '-'
+        lines.append(f"{case['dataset']:>10} {case['candles']:>5} {label:<34} " + '  '.join(changes))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark replay frame times offscreen")
+    parser.add_argument('--data', action='append', default=None, metavar='PATH',
+                        help=f"CSV file or OHLCV store to replay; repeatable (default: {BUNDLED_FILE})")
+    parser.add_argument('--synthetic-days', type=int, default=250,
+                        help="weekdays of synthetic 1min data to add (0: none)")
+    parser.add_argument('--counts', default=','.join(map(str, CANDLE_COUNTS)),
+                        help="visible candle counts, comma separated")
+    parser.add_argument('--combos', choices=('all', 'single'), default='all',
+                        help="every indicator combination, or none/each/all")
+    parser.add_argument('--timeframe', type=int, default=None,
+                        help="bar length in minutes (default: each file's own)")
+    parser.add_argument('--steps', type=int, default=50, help="bars stepped per case")
+    parser.add_argument('--warmup', type=int, default=5, help="bars stepped before measuring")
+    parser.add_argument('--output', default=None, help="write the JSON report here (default: stdout)")
+    parser.add_argument('--compare', default=None, help="baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    datasets = {}
+    for path in args.data or [BUNDLED_FILE]:
+        datasets[os.path.basename(path)] = path
+    if args.synthetic_days > 0:
+        tz = 'Asia/Kolkata'
+        datasets['synthetic'] = OHLCVStore.from_frame(synthetic_frame(args.synthetic_days, tz=tz), tz)
+
+    counts = [int(count) for count in args.counts.split(',')]
+    report = run_benchmark(datasets, counts, args.combos, args.steps, args.warmup, args.timeframe,
+                           log=lambda line: print(line, file=sys.stderr))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare(baseline, report):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
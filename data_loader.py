@@ -0,0 +1,512 @@
+"""
+Data loading helpers for the Nifty Replay Tool.
+
+Cleaned CSV data is cached next to the source file in a columnar .npz
+sidecar, so reloading a file that has not changed skips CSV parsing.
+"""
+
+
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# Bump whenever the cleaning rules change so old caches are rebuilt
+LOADER_VERSION = 3
+CACHE_SUFFIX = '.cache.npz'
+
+NS_PER_MINUTE = 60 * 10**9
+NS_PER_DAY = 1440 * NS_PER_MINUTE
+
+# Regular NSE trading hours as (open, close) minutes of the day, both inclusive
+REGULAR_SESSION = (9 * 60 + 15, 15 * 60 + 30)
+
+# Rows parsed between progress reports
+CHUNK_ROWS = 200_000
+
+# Candles looked at to infer the bar length, so a long memory-mapped store
+# isn't read end to end for it
+INFER_ROWS = 100_000
+
+
+# Fixed-width timestamp layouts parsed by slicing digits: format -> (field
+# slices, separator positions); anything else goes through pandas
+FIXED_DATETIME_LAYOUTS = {
+    '%d-%m-%Y %H:%M': ({'day': 0, 'month': 3, 'year': 6, 'hour': 11, 'minute': 14},
+                       {2: '-', 5: '-', 10: ' ', 13: ':'}),
+    '%d-%m-%Y %H:%M:%S': ({'day': 0, 'month': 3, 'year': 6, 'hour': 11, 'minute': 14, 'second': 17},
+                          {2: '-', 5: '-', 10: ' ', 13: ':', 16: ':'}),
+    '%d/%m/%Y %H:%M': ({'day': 0, 'month': 3, 'year': 6, 'hour': 11, 'minute': 14},
+                       {2: '/', 5: '/', 10: ' ', 13: ':'}),
+    '%d/%m/%Y %H:%M:%S': ({'day': 0, 'month': 3, 'year': 6, 'hour': 11, 'minute': 14, 'second': 17},
+                          {2: '/', 5: '/', 10: ' ', 13: ':', 16: ':'}),
+    '%Y-%m-%d %H:%M': ({'year': 0, 'month': 5, 'day': 8, 'hour': 11, 'minute': 14},
+                       {4: '-', 7: '-', 10: ' ', 13: ':'}),
+    '%Y-%m-%d %H:%M:%S': ({'year': 0, 'month': 5, 'day': 8, 'hour': 11, 'minute': 14, 'second': 17},
+                          {4: '-', 7: '-', 10: ' ', 13: ':', 16: ':'}),
+    '%Y-%m-%dT%H:%M': ({'year': 0, 'month': 5, 'day': 8, 'hour': 11, 'minute': 14},
+                       {4: '-', 7: '-', 10: 'T', 13: ':'}),
+    '%Y-%m-%dT%H:%M:%S': ({'year': 0, 'month': 5, 'day': 8, 'hour': 11, 'minute': 14, 'second': 17},
+                          {4: '-', 7: '-', 10: 'T', 13: ':', 16: ':'}),
+}
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+class LoadCancelled(Exception):
+    """Raised from a progress callback to abandon a load"""
+
+
+def parse_window(text):
+    """'09:15-15:30' as (open, close) minutes of the day"""
+    start, end = (part.strip() for part in text.split('-'))
+    window = tuple(int(hours) * 60 + int(minutes) for hours, minutes in
+                   (value.split(':') for value in (start, end)))
+    if not 0 <= window[0] <= window[1] < 1440:
+        raise ValueError(f"Invalid session window: {text!r}")
+    return window
+
+
+def format_window(window):
+    return '-'.join(f"{minute // 60:02d}:{minute % 60:02d}" for minute in window)
+
+
+class TradingSessions:
+    """Times of day whose candles are kept when cleaning data.
+
+    `windows` are the (open, close) minutes kept every day, both inclusive
+    (add a pre-open window to keep 09:00-09:08); `dates` maps a date to the
+    windows replacing them on that day, for half-days and the evening
+    muhurat session. Sessions are read from JSON files such as
+
+        {"windows": ["09:15-15:30"],
+         "dates": {"2024-11-01": ["18:00-19:00"]}}
+    """
+
+    def __init__(self, windows=(REGULAR_SESSION,), dates=None):
+        self.windows = sorted(tuple(window) for window in windows)
+        self.dates = {np.datetime64(date, 'D'): sorted(tuple(window) for window in day_windows)
+                      for date, day_windows in (dates or {}).items()}
+
+    @classmethod
+    def from_dict(cls, spec):
+        windows = [parse_window(text) for text in spec.get('windows', [format_window(REGULAR_SESSION)])]
+        dates = {date: [parse_window(text) for text in day_windows]
+                 for date, day_windows in spec.get('dates', {}).items()}
+        return cls(windows, dates)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path) as f:
+            return cls.from_dict(json.load(f))
+
+    def key(self):
+        """Text identifying the sessions, for cache keys"""
+        windows = ','.join(format_window(window) for window in self.windows)
+        dates = ';'.join(f"{date}={','.join(format_window(window) for window in day_windows)}"
+                         for date, day_windows in sorted(self.dates.items()))
+        return f"{windows};{dates}" if dates else windows
+
+    def contains(self, local_ns):
+        """Mask of local wall-clock epoch nanoseconds falling in a session"""
+        day, time_of_day = np.divmod(local_ns, NS_PER_DAY)
+        keep = self.in_windows(time_of_day, self.windows)
+        if self.dates:
+            special = np.isin(day, np.array(list(self.dates), dtype='datetime64[D]').view(np.int64))
+            for date in np.unique(day[special]):
+                rows = np.flatnonzero(day == date)
+                keep[rows] = self.in_windows(time_of_day[rows], self.windows_on(date))
+        return keep
+
+    def windows_on(self, day):
+        """Windows of a day given as days since 1970-01-01"""
+        return self.dates.get(np.datetime64(int(day), 'D'), self.windows)
+
+    @staticmethod
+    def in_windows(time_of_day, windows):
+        keep = np.zeros(len(time_of_day), dtype=bool)
+        for start, end in windows:
+            keep |= (time_of_day >= start * NS_PER_MINUTE) & (time_of_day <= end * NS_PER_MINUTE)
+        return keep
+
+
+DEFAULT_SESSIONS = TradingSessions()
+
+
+def fixed_datetime_format(text):
+    """The FIXED_DATETIME_LAYOUTS format a timestamp string is in, or None"""
+    for fmt, (fields, separators) in FIXED_DATETIME_LAYOUTS.items():
+        width = max(separators) + 3
+        if (len(text) == width
+                and all(text[pos] == sep for pos, sep in separators.items())
+                and all(text[pos:pos + 1].isdigit() for pos in range(width) if pos not in separators)):
+            return fmt
+    return None
+
+
+def parse_fixed_datetimes(values, fmt):
+    """Local wall-clock epoch nanoseconds of timestamp strings all in one
+    fixed-width format, parsed as integer digit slices; None if any of
+    them doesn't fit the format or isn't a valid date and time"""
+    fields, separators = FIXED_DATETIME_LAYOUTS[fmt]
+    width = max(separators) + 3
+    try:
+        # One spare byte per string, which is NUL unless a string is too long
+        raw = np.asarray(values, dtype=f'S{width + 1}')
+    except (UnicodeEncodeError, ValueError):
+        return None
+    if len(raw) == 0:
+        return np.empty(0, dtype=np.int64)
+    chars = raw.view(np.uint8).reshape(len(raw), width + 1)
+    if chars[:, width].any():
+        return None
+
+    # Every separator in place and every other character a digit (this also
+    # rejects shorter strings, which are padded with NUL bytes)
+    digit_cols = [pos for pos in range(width) if pos not in separators]
+    digits = chars[:, digit_cols].astype(np.int64) - ord('0')
+    if ((digits < 0) | (digits > 9)).any():
+        return None
+    for pos, sep in separators.items():
+        if (chars[:, pos] != ord(sep)).any():
+            return None
+
+    column = {pos: i for i, pos in enumerate(digit_cols)}
+    
+    def number(name, length):
+        start = fields[name]
+        result = np.zeros(len(raw), dtype=np.int64)
+        for pos in range(start, start + length):
+            result = result * 10 + digits[:, column[pos]]
+        return result
+
+    year, month, day = number('year', 4), number('month', 2), number('day', 2)
+    hour, minute = number('hour', 2), number('minute', 2)
+    second = number('second', 2) if 'second' in fields else 0
+    if ((month < 1) | (month > 12)).any() or (hour > 23).any() or (minute > 59).any() or np.any(second > 59):
+        return None
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    if ((day < 1) | (day > DAYS_IN_MONTH[month - 1] + ((month == 2) & leap))).any():
+        return None
+
+    # Days since 1970-01-01 of a proleptic Gregorian date (civil-from-days inverse)
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+    return ((days * 1440 + hour * 60 + minute) * 60 + second) * 10**9
+
+
+def parse_datetimes(values):
+    """Naive datetime64[ns] array of timestamp strings.
+
+    Known fixed-width layouts such as 01-04-2021 09:15 are parsed by integer
+    slicing, other layouts matching one format with an explicit format
+    string, and only unknown ones by pandas inference (day first unless the
+    year comes first). pandas may hand back another unit (microseconds in
+    pandas 3), so its results are converted to nanoseconds like the rest:
+
+    >>> parse_datetimes(['1-4-2021 9:15', '1-4-2021 9:16'])
+    array(['2021-04-01T09:15:00.000000000', '2021-04-01T09:16:00.000000000'],
+          dtype='datetime64[ns]')
+    >>> parse_datetimes(['2021-04-01 09:15:00.000']).view('int64')
+    array([1617268500000000000])
+    """
+    values = np.asarray(values, dtype=object)
+    if len(values) == 0:
+        return np.empty(0, dtype='datetime64[ns]')
+    first = str(values[0]).strip()
+    fmt = fixed_datetime_format(first)
+    if fmt is not None:
+        local_ns = parse_fixed_datetimes(values, fmt)
+        if local_ns is not None:
+            return local_ns.view('datetime64[ns]')
+    for fmt in FIXED_DATETIME_LAYOUTS:
+        try:
+            datetime.strptime(first, fmt)
+        except ValueError:
+            continue
+        try:
+            return pd.to_datetime(values, format=fmt).to_numpy().astype('datetime64[ns]')
+        except (ValueError, TypeError):
+            break
+    # Day first unless the year leads (2021-04-01); rows in more than one
+    # layout are parsed one by one
+    dayfirst = not first[:4].isdigit()
+    try:
+        parsed = pd.to_datetime(values, dayfirst=dayfirst)
+    except ValueError:
+        parsed = pd.to_datetime(values, dayfirst=dayfirst, format='mixed')
+    return parsed.to_numpy().astype('datetime64[ns]')
+
+
+def complete_length(file_path, block=1 << 16):
+    """Bytes of a file up to and including its last newline, leaving out a
+    last row that is still being written"""
+    with open(file_path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - block, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+class PrefixReader(io.RawIOBase):
+    """The first `length` bytes of a binary file, read as a file of their own"""
+
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.f.readinto(memoryview(buffer)[:min(len(buffer), self.remaining)])
+        self.remaining -= count
+        return count
+
+
+def read_csv(file_path, tz, progress=None, sessions=DEFAULT_SESSIONS, length=None):
+    """Parse a datetime,open,high,low,close,... CSV and keep trading hours.
+
+    With `length` only the first that many bytes are parsed, as when
+    complete_length() leaves out a half-written last row. With a progress
+    callback the file is parsed in chunks and progress(fraction_done) is
+    called after each one; the callback may raise LoadCancelled to stop.
+    """
+    # Timestamps are read as text and parsed by clean_frame()
+    if progress is None and length is None:
+        df = pd.read_csv(file_path, dtype={'datetime': str})
+        return clean_frame(df, tz, sessions)
+    
+    size = max(os.path.getsize(file_path) if length is None else length, 1)
+    with open(file_path, 'rb') as f:
+        source = f if length is None else io.BufferedReader(PrefixReader(f, length))
+        if progress is None:
+            return clean_frame(pd.read_csv(source, dtype={'datetime': str}), tz, sessions)
+        chunks = []
+        for chunk in pd.read_csv(source, dtype={'datetime': str}, chunksize=CHUNK_ROWS):
+            chunks.append(chunk)
+            progress(min(f.tell() / size, 1.0))
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['datetime'])
+    return clean_frame(df, tz, sessions)
+
+
+def clean_frame(df, tz, sessions=DEFAULT_SESSIONS):
+    """Keep rows in the trading sessions, sort them and drop duplicate
+    timestamps (keeping the first), then localize to `tz`.
+
+    All three steps work on the int64 wall-clock nanoseconds and end in a
+    single take() of the rows that remain.
+    """
+    if isinstance(df['datetime'].dtype, pd.DatetimeTZDtype):
+        local_ns = local_epoch_ns(to_epoch_ns(df['datetime']), tz)
+    elif pd.api.types.is_datetime64_any_dtype(df['datetime']):
+        local_ns = df['datetime'].to_numpy().astype('datetime64[ns]').view(np.int64)
+    else:
+        local_ns = parse_datetimes(df['datetime']).view(np.int64)
+    
+    rows = np.flatnonzero(sessions.contains(local_ns))
+    rows = rows[np.argsort(local_ns[rows], kind='stable')]
+    sorted_ns = local_ns[rows]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = sorted_ns[1:] != sorted_ns[:-1]
+    rows = rows[first]
+    
+    df = df.drop(columns='datetime').take(rows).reset_index(drop=True)
+    datetimes = pd.DatetimeIndex(local_ns[rows].view('datetime64[ns]')).tz_localize(tz)
+    df.insert(0, 'datetime', datetimes)
+    return df
+
+
+class CSVTail:
+    """Reads the rows appended to a growing CSV file since the last read.
+
+    Only the bytes after `offset` (which must be at the start of a line) are
+    read, up to the last complete line, and they go through the same
+    cleaning as a full load. A row still being written is left for the next
+    read.
+    """
+
+    def __init__(self, file_path, tz, offset, sessions=DEFAULT_SESSIONS):
+        self.file_path = file_path
+        self.tz = tz
+        self.sessions = sessions
+        self.offset = offset
+        with open(file_path, 'rb') as f:
+            self.header = f.readline()
+
+    def read(self):
+        """Cleaned frame of the complete rows appended since the last read"""
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            raise ValueError(f"{os.path.basename(self.file_path)} was truncated or replaced")
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        end = chunk.rfind(b'\n') + 1
+        self.offset += end
+        if end == 0:
+            return None
+        
+        df = pd.read_csv(io.BytesIO(self.header + chunk[:end]), dtype={'datetime': str})
+        return clean_frame(df, self.tz, self.sessions)
+
+
+def cache_key(file_path, tz, sessions=DEFAULT_SESSIONS, length=None):
+    """Identity of a source file: path, size (or the `length` parsed), mtime,
+    timezone, sessions and loader version"""
+    stat = os.stat(file_path)
+    size = stat.st_size if length is None else length
+    return (f"{os.path.abspath(file_path)}|{size}|{stat.st_mtime_ns}|{tz}|"
+            f"{sessions.key()}|{LOADER_VERSION}")
+
+
+def read_cache(file_path, key, tz):
+    """Cleaned frame from the sidecar cache, or None if it is missing or stale"""
+    try:
+        with np.load(file_path + CACHE_SUFFIX, allow_pickle=False) as cache:
+            if str(cache['key']) != key:
+                return None
+            data = {'datetime': pd.to_datetime(cache['datetime'], unit='ns', utc=True).tz_convert(tz)}
+            for column in cache['columns']:
+                data[str(column)] = cache['col_' + str(column)]
+    except (OSError, KeyError, ValueError):
+        return None
+    return pd.DataFrame(data)
+
+
+def write_cache(file_path, key, df):
+    """Store a cleaned frame as numeric columns plus int64 epoch nanoseconds"""
+    columns = [column for column in df.columns if column != 'datetime']
+    # Only numeric data goes into the cache; anything else is re-parsed each time
+    if not all(pd.api.types.is_numeric_dtype(df[column]) for column in columns):
+        return
+    
+    epoch_ns = to_epoch_ns(df['datetime'])
+    arrays = {'col_' + column: df[column].to_numpy() for column in columns}
+    
+    # A temporary file of its own, so windows or processes caching the same file don't collide
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)),
+                                        prefix=os.path.basename(file_path) + '.', suffix=CACHE_SUFFIX + '.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, key=np.array(key), columns=np.array(columns, dtype=str),
+                     datetime=epoch_ns, **arrays)
+        os.replace(tmp_path, file_path + CACHE_SUFFIX)
+    except OSError:
+        # A read-only data folder just means no cache
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def load_csv(file_path, tz, use_cache=True, progress=None, sessions=DEFAULT_SESSIONS, length=None):
+    """Load a cleaned frame (of the first `length` bytes, if given), from the
+    sidecar cache while the CSV is unchanged"""
+    if not use_cache:
+        return read_csv(file_path, tz, progress, sessions, length)
+    
+    key = cache_key(file_path, tz, sessions, length)
+    df = read_cache(file_path, key, tz)
+    if df is None:
+        df = read_csv(file_path, tz, progress, sessions, length)
+        write_cache(file_path, key, df)
+    return df
+
+
+def to_epoch_ns(datetimes):
+    """Timezone-aware datetime Series as int64 UTC epoch nanoseconds"""
+    return (datetimes.dt.tz_convert('UTC').dt.tz_localize(None)
+            .to_numpy().astype('datetime64[ns]').view(np.int64))
+
+
+def local_epoch_ns(epoch_ns, tz):
+    """UTC epoch nanoseconds shifted to local wall-clock nanoseconds"""
+    return (pd.to_datetime(epoch_ns, unit='ns', utc=True).tz_convert(tz).tz_localize(None)
+            .to_numpy().astype('datetime64[ns]').view(np.int64))
+
+
+def infer_bar_minutes(epoch_ns):
+    """Most common gap between consecutive candles (of the first INFER_ROWS), in whole minutes"""
+    gaps = np.diff(epoch_ns[:INFER_ROWS + 1]) // NS_PER_MINUTE
+    gaps = gaps[gaps > 0]
+    if len(gaps) == 0:
+        return 1
+    values, counts = np.unique(gaps, return_counts=True)
+    return int(values[np.argmax(counts)])
+
+
+class SessionTimeline:
+    """Gapless x-axis for a series of candles.
+
+    Candle i sits at x = i * bar_minutes, so nights, weekends, holidays,
+    half-days and missing candles never leave holes in the chart. Bar
+    index, x-coordinate and timestamp map to each other exactly, computed
+    for the bars asked about rather than stored for all of them.
+    """
+
+    def __init__(self, epoch_ns, bar_minutes=None):
+        self.epoch = epoch_ns
+        self.bar_minutes = bar_minutes or infer_bar_minutes(epoch_ns)
+
+    def __len__(self):
+        return len(self.epoch)
+
+    def x_at_index(self, idx):
+        """x-coordinate of bar index (scalar or array)"""
+        return np.asarray(idx) * float(self.bar_minutes)
+
+    def x_range(self, start, end):
+        """x-coordinates of bars [start, end)"""
+        return self.x_at_index(np.arange(start, end))
+
+    def index_at_x(self, x):
+        """Nearest bar index to an x-coordinate (scalar or array), clipped to the data"""
+        idx = np.rint(np.asarray(x, dtype=np.float64) / self.bar_minutes).astype(np.int64)
+        return np.clip(idx, 0, max(len(self) - 1, 0))
+
+    def index_span(self, x_min, x_max):
+        """(start, end) of the bars whose x-coordinates lie in [x_min, x_max]"""
+        start = max(int(np.ceil(x_min / self.bar_minutes)), 0)
+        end = min(int(np.floor(x_max / self.bar_minutes)) + 1, len(self))
+        return start, max(end, start)
+
+    def epoch_at_index(self, idx):
+        """UTC epoch nanoseconds of bar index (scalar or array)"""
+        return np.asarray(self.epoch)[idx]
+
+    def index_at_epoch(self, epoch_ns):
+        """Index of the last bar starting at or before a UTC epoch time, clipped to the data"""
+        idx = np.searchsorted(self.epoch, epoch_ns, side='right') - 1
+        return np.clip(idx, 0, max(len(self) - 1, 0))
+
+
+def build_day_index(epoch_ns, tz):
+    """Positions where each trading day starts, and the date of each day.
+
+    Returns (day_starts, day_dates): a sorted int64 array of row positions
+    and the matching datetime64[D] local dates, both one entry per day.
+    """
+    days = local_epoch_ns(epoch_ns, tz).astype('datetime64[ns]').astype('datetime64[D]')
+    if len(days) == 0:
+        return np.empty(0, dtype=np.int64), days
+    is_start = np.empty(len(days), dtype=bool)
+    is_start[0] = True
+    np.not_equal(days[1:], days[:-1], out=is_start[1:])
+    day_starts = np.flatnonzero(is_start).astype(np.int64)
+    return day_starts, days[day_starts]
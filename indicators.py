@@ -0,0 +1,191 @@
+"""
+Indicators for the Nifty Replay Tool.
+
+Each indicator is computed once over the whole loaded series, so values
+never change as the replay window scrolls, and the chart only has to slice
+the cached arrays for every frame. When candles are appended, cached results
+are extended from their last values instead of being recomputed.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+
+def ema(close, period):
+    """Exponential moving average, NaN until `period` candles are available"""
+    return (pd.Series(close).ewm(span=period, adjust=False, min_periods=period)
+            .mean().to_numpy())
+
+
+def sma(close, period):
+    """Simple moving average, NaN until `period` candles are available"""
+    return pd.Series(close).rolling(window=period).mean().to_numpy()
+
+
+def bollinger(close, period, num_std):
+    """Bollinger Bands as (upper, middle, lower)"""
+    rolling = pd.Series(close).rolling(window=period)
+    middle = rolling.mean().to_numpy()
+    std = rolling.std().to_numpy()
+    return middle + std * num_std, middle, middle - std * num_std
+
+
+def rsi(close, period):
+    """RSI from simple rolling averages of gains and losses"""
+    delta = np.diff(close, prepend=np.nan)
+    gain = pd.Series(np.where(delta > 0, delta, 0.0))
+    loss = pd.Series(np.where(delta < 0, -delta, 0.0))
+    avg_gain = gain.rolling(window=period, min_periods=period).mean().to_numpy()
+    avg_loss = loss.rolling(window=period, min_periods=period).mean().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / np.where(avg_loss == 0, np.nan, avg_loss)
+    return 100 - (100 / (1 + rs))
+
+
+def macd(close, fast, slow, signal):
+    """MACD as (macd, signal, histogram)"""
+    return macd_from_emas(ema(close, fast), ema(close, slow), signal)
+
+
+def macd_from_emas(fast_ema, slow_ema, signal):
+    """MACD as (macd, signal, histogram) from its fast and slow EMAs"""
+    macd_line = fast_ema - slow_ema
+    signal_line = ema(macd_line, signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def extend_ema(result, close, start, period):
+    """EMA of `close` where `result` already holds the EMA of close[:start].
+
+    The adjust=False recursion only needs the last value, so just the new
+    candles are computed; before the EMA has warmed up it is recomputed.
+    """
+    if start == 0 or start > len(result) or np.isnan(result[start - 1]):
+        return ema(close, period)
+    tail = (pd.Series(np.concatenate(([result[start - 1]], close[start:])))
+            .ewm(span=period, adjust=False).mean().to_numpy()[1:])
+    return np.concatenate((result[:start], tail))
+
+
+def extend_rolling(func, lookback, result, close, start, *params):
+    """Extend a rolling-window indicator by recomputing only the last
+    `lookback` old candles plus the new ones"""
+    from_idx = max(start - lookback, 0)
+    tail = func(close[from_idx:], *params)
+    if isinstance(result, tuple):
+        return tuple(np.concatenate((old[:start], new[start - from_idx:]))
+                     for old, new in zip(result, tail))
+    return np.concatenate((result[:start], tail[start - from_idx:]))
+
+
+INDICATORS = {
+    'ema': ema,
+    'sma': sma,
+    'bollinger': bollinger,
+    'rsi': rsi,
+    'macd': macd,
+}
+
+
+# Per-session series kept as data columns next to OHLCV
+SESSION_COLUMNS = ('vwap', 'day_high', 'day_low')
+
+
+def session_series(data, start=0):
+    """VWAP and running day high and low of every candle from the session
+    holding row `start` on, as (from_row, {name: values}).
+
+    Cumulative sums restart at each session open of the day index. The
+    VWAP weighs the typical price (high + low + close) / 3 by volume; while
+    a session has no volume so far, as with index data, it is the plain
+    average of the typical prices instead.
+    """
+    day_starts = np.asarray(data.day_starts)
+    day = max(int(np.searchsorted(day_starts, start, side='right')) - 1, 0)
+    from_row = int(day_starts[day]) if len(day_starts) else 0
+    high = np.asarray(data['high'][from_row:], dtype=float)
+    low = np.asarray(data['low'][from_row:], dtype=float)
+    close = np.asarray(data['close'][from_row:], dtype=float)
+    if 'volume' in data:
+        volume = np.nan_to_num(np.asarray(data['volume'][from_row:], dtype=float))
+    else:
+        volume = np.zeros(len(close))
+
+    lengths = np.diff(np.append(day_starts[day:], len(data))) if len(close) else np.empty(0, dtype=np.int64)
+    session = pd.Series(np.repeat(np.arange(len(lengths)), lengths))
+    typical = (high + low + close) / 3
+    sums = pd.DataFrame({'pv': typical * volume, 'volume': volume, 'typical': typical,
+                         'count': 1.0}).groupby(session).cumsum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.where(sums['volume'].to_numpy() > 0,
+                        sums['pv'].to_numpy() / sums['volume'].to_numpy(),
+                        sums['typical'].to_numpy() / sums['count'].to_numpy())
+    return from_row, {
+        'vwap': vwap,
+        'day_high': pd.Series(high).groupby(session).cummax().to_numpy(),
+        'day_low': pd.Series(low).groupby(session).cummin().to_numpy(),
+    }
+
+
+def add_session_columns(data, start=0):
+    """Compute the SESSION_COLUMNS of `data` from row `start` on and store
+    them as its columns, keeping earlier sessions' values"""
+    from_row, series = session_series(data, start)
+    for name, values in series.items():
+        if from_row > 0:
+            values = np.concatenate((np.asarray(data[name][:from_row]), values))
+        data.add_column(name, values)
+
+
+class IndicatorEngine:
+    """Full-series indicator arrays cached by (indicator, params)"""
+
+    def __init__(self):
+        self.data = None
+        self.cache = {}
+
+    @property
+    def close(self):
+        """Close prices as floats, read from the data only when an indicator is computed"""
+        return np.asarray(self.data['close'], dtype=float)
+
+    def set_data(self, data):
+        """Use a newly loaded dataset, dropping every cached result"""
+        self.data = data
+        self.cache.clear()
+
+    def get(self, name, *params):
+        """Return the full-series result for an indicator, computing it on first use"""
+        key = (name,) + params
+        if key not in self.cache:
+            self.cache[key] = INDICATORS[name](self.close, *params)
+        return self.cache[key]
+
+    def extend(self, data, start):
+        """Use `data`, which is the previous data with candles appended from
+        row `start` on (replacing any from there), extending every cached result"""
+        self.data = data
+        close = self.close
+        # EMAs first: MACD is extended from the cached EMAs it is built on
+        for key in sorted(self.cache, key=lambda key: key[0] != 'ema'):
+            name, params = key[0], key[1:]
+            result = self.cache[key]
+            if name == 'ema':
+                self.cache[key] = extend_ema(result, close, start, *params)
+            elif name == 'macd':
+                fast, slow, signal = params
+                line, signal_line, _ = result
+                fast_ema, slow_ema = self.get('ema', fast), self.get('ema', slow)
+                line = np.concatenate((line[:start], fast_ema[start:] - slow_ema[start:]))
+                signal_line = extend_ema(signal_line, line, start, signal)
+                self.cache[key] = (line, signal_line, line - signal_line)
+            elif name == 'rsi':
+                self.cache[key] = extend_rolling(rsi, params[0] + 1, result, close, start, *params)
+            else:
+                self.cache[key] = extend_rolling(INDICATORS[name], params[0], result, close, start, *params)
+
+    def invalidate(self, name):
+        """Drop every cached result of one indicator"""
+        for key in [key for key in self.cache if key[0] == name]:
+            del self.cache[key]
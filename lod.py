@@ -0,0 +1,116 @@
+"""
+Level-of-detail pyramid for drawing more candles than there are pixels.
+
+Level k of an OHLCPyramid holds the candles of a store merged in blocks of
+2**k, each block starting at a multiple of 2**k: first open, max high, min
+low, last close and summed volume. Zoomed out, the chart draws one block per
+pixel column from the finest level that fits, reading O(pixels) values
+whatever the number of candles; as blocks sit on a fixed grid, panning does
+not make them shimmer.
+
+    pyramid = OHLCPyramid(store)
+    blocks = pyramid.blocks(start, end, pyramid.level_for(end - start, 1600))
+"""
+
+
+import numpy as np
+
+
+def merge_pairs(level):
+    """The next level up: every two neighbouring blocks merged into one"""
+    n = len(level['high'])
+    starts = np.arange(0, n, 2)
+    last = np.minimum(starts + 1, n - 1)
+    merged = {
+        'open': level['open'][starts],
+        'high': np.maximum.reduceat(level['high'], starts),
+        'low': np.minimum.reduceat(level['low'], starts),
+        'close': level['close'][last],
+    }
+    if 'volume' in level:
+        merged['volume'] = np.add.reduceat(level['volume'], starts)
+    return merged
+
+
+class OHLCPyramid:
+    """Min/max pyramid over the OHLC (and volume) columns of an OHLCVStore"""
+
+    def __init__(self, data):
+        self.data = data
+        self.levels = []  # levels[k - 1] -> column arrays of level k
+        self.stale = None  # First row changed since the levels were built
+        if data.lod is not None:
+            self.levels = list(data.lod)  # Saved with a store, memory-mapped
+        else:
+            self.rebuild(0)
+
+    def base(self, start=0, end=None):
+        """Candles [start, end) as level 0 column arrays"""
+        return {name: np.asarray(self.data[name][start:end], dtype=np.float64)
+                for name in ('open', 'high', 'low', 'close', 'volume') if name in self.data}
+
+    def extend(self, start):
+        """Note that the store was appended to or had its candles replaced from
+        row `start` on; the blocks holding them are rebuilt when next read"""
+        self.stale = start if self.stale is None else min(self.stale, start)
+
+    def rebuild(self, start):
+        """Rebuild the blocks holding candles from row `start` on"""
+        self.stale = None
+        k, below = 1, self.base(start & ~1)
+        while len(self.data) > 1 << (k - 1):
+            first = start >> k  # First block of level k to rebuild
+            merged = merge_pairs(below)
+            if k <= len(self.levels):
+                level = self.levels[k - 1]
+                self.levels[k - 1] = {name: np.concatenate((level[name][:first], merged[name]))
+                                      for name in merged}
+            else:
+                self.levels.append(merged)
+            # Level k blocks the next level is built from, starting at an even one
+            from_block = first & ~1
+            below = {name: values[from_block:] for name, values in self.levels[k - 1].items()}
+            start = from_block << k
+            k += 1
+        del self.levels[k - 1:]
+
+    def level_for(self, rows, width_px):
+        """Finest level with no more blocks than pixel columns for `rows` candles (0: draw them all)"""
+        if rows <= width_px:
+            return 0
+        if self.stale is not None:
+            self.rebuild(self.stale)
+        return min(int(np.ceil(np.log2(rows / max(width_px, 1)))), len(self.levels))
+
+    def blocks(self, start, end, k):
+        """Blocks of level k covering candles [start, end), the first and last
+        cut down to that range; returns column arrays plus 'first' and 'last',
+        the rows each block starts and ends at"""
+        if self.stale is not None:
+            self.rebuild(self.stale)
+        k = min(k, len(self.levels))
+        if k == 0:
+            columns = self.base(start, end)
+            rows = np.arange(start, end)
+            columns['first'] = columns['last'] = rows
+            return columns
+        level = self.levels[k - 1]
+        first_block, last_block = start >> k, (end - 1) >> k
+        columns = {name: values[first_block:last_block + 1].copy() for name, values in level.items()}
+        starts = np.arange(first_block, last_block + 1) << k
+        columns['first'] = np.maximum(starts, start)
+        columns['last'] = np.minimum(starts + (1 << k), end) - 1
+
+        # Blocks reaching past the range are recomputed from their candles in it
+        for i, (lo, hi) in ((0, (start, min((first_block + 1) << k, end))),
+                            (-1, (max(last_block << k, start), end))):
+            if hi - lo == 1 << k:
+                continue
+            candles = self.base(lo, hi)
+            columns['open'][i] = candles['open'][0]
+            columns['high'][i] = candles['high'].max()
+            columns['low'][i] = candles['low'].min()
+            columns['close'][i] = candles['close'][-1]
+            if 'volume' in candles:
+                columns['volume'][i] = candles['volume'].sum()
+        return columns
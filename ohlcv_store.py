@@ -0,0 +1,332 @@
+"""
+Columnar OHLCV store for the Nifty Replay Tool.
+
+A store is a directory with one raw fixed-width file per column (int64
+epoch nanoseconds, float64 OHLC, int64 volume, plus any other numeric
+column of the source), the day index, and a meta.json describing them.
+What the replay derives from the candles (the session VWAP and day high
+and low, and the OHLC pyramid for drawing zoomed out) is saved alongside.
+Opened stores are memory-mapped, so only the pages of the candles that are
+actually read come off the disk.
+
+Convert a datetime,open,high,low,close,volume CSV with:
+
+    python ohlcv_store.py data/nifty_15min.csv data/nifty_15min.ohlcv
+"""
+
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (read_csv, to_epoch_ns, local_epoch_ns, build_day_index, NS_PER_MINUTE,
+                         TradingSessions, DEFAULT_SESSIONS)
+from indicators import SESSION_COLUMNS, add_session_columns
+from lod import OHLCPyramid
+
+
+STORE_VERSION = 1
+META_FILE = 'meta.json'
+DAY_STARTS_FILE = 'day_starts.i8'
+DAY_DATES_FILE = 'day_dates.i8'
+LOD_FILE = 'lod.{name}.f8'  # Every pyramid level of a column, one after the other
+
+# Resampled bars are anchored at the 09:15 session open
+SESSION_OPEN_MINUTE = 9 * 60 + 15
+
+# Fixed dtypes for the core columns; other numeric columns keep their own
+COLUMN_DTYPES = {
+    'epoch': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.int64,
+}
+
+
+def is_store_path(path):
+    """True for a store directory or the meta.json inside one"""
+    if os.path.basename(path) == META_FILE:
+        path = os.path.dirname(path)
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def map_array(path, dtype, length):
+    """Read-only memory map of a raw column file"""
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+
+class OHLCVStore:
+    """Candles as named 1-D column arrays plus a day index.
+
+    The arrays are plain numpy arrays for data loaded from a CSV, or
+    read-only memory maps for a store opened from disk; everything reading
+    from the store works the same either way.
+    """
+
+    def __init__(self, columns, day_starts, day_dates, tz, summary=None, path=None, lod=None):
+        self.columns = columns
+        self.day_starts = day_starts
+        self.day_dates = day_dates
+        self.tz = str(tz)
+        self.path = path
+        self.lod = lod  # OHLCPyramid levels saved with the store, until the candles change
+        self._summary = summary
+        self._buffers = {}  # Spare-capacity arrays behind columns grown by append()
+
+    @classmethod
+    def from_frame(cls, df, tz):
+        """Build an in-memory store from a cleaned DataFrame"""
+        columns = {'epoch': to_epoch_ns(df['datetime'])}
+        for name in df.columns:
+            if name == 'datetime' or not pd.api.types.is_numeric_dtype(df[name]):
+                continue
+            values = df[name].to_numpy()
+            if name in COLUMN_DTYPES:
+                if name == 'volume':
+                    values = np.nan_to_num(values)
+                values = values.astype(COLUMN_DTYPES[name])
+            columns[name] = np.ascontiguousarray(values)
+        day_starts, day_dates = build_day_index(columns['epoch'], tz)
+        return cls(columns, day_starts, day_dates, tz)
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a store directory (or the meta.json inside it)"""
+        if os.path.basename(path) == META_FILE:
+            path = os.path.dirname(path)
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported OHLCV store version: {meta.get('version')}")
+
+        rows = meta['rows']
+        columns = {
+            name: map_array(os.path.join(path, info['file']), np.dtype(info['dtype']), rows)
+            for name, info in meta['columns'].items()
+        }
+        days = meta['days']
+        day_starts = map_array(os.path.join(path, DAY_STARTS_FILE), np.int64, days)
+        day_dates = np.asarray(map_array(os.path.join(path, DAY_DATES_FILE), np.int64, days)
+                               ).astype('datetime64[D]')
+        lod = None
+        if 'lod' in meta:
+            lengths = meta['lod']['levels']
+            ends = np.cumsum(lengths)
+            lod = [{} for _ in lengths]
+            for name, info in meta['lod']['columns'].items():
+                values = map_array(os.path.join(path, info['file']), np.dtype(info['dtype']), int(sum(lengths)))
+                for level, end, length in zip(lod, ends, lengths):
+                    level[name] = values[end - length:end]
+        return cls(columns, day_starts, day_dates, meta['tz'], meta.get('summary'), path, lod)
+
+    def save(self, path, symbol=None):
+        """Write the store to a directory as raw column files plus meta.json,
+        with the session columns and the OHLC pyramid the replay would
+        otherwise compute from every candle when the store is opened"""
+        os.makedirs(path, exist_ok=True)
+        if len(self) and not all(name in self.columns for name in SESSION_COLUMNS):
+            add_session_columns(self)
+        meta_columns = {}
+        for name, values in self.columns.items():
+            values = np.ascontiguousarray(values)
+            file_name = f"{name}.{values.dtype.kind}{values.dtype.itemsize}"
+            values.tofile(os.path.join(path, file_name))
+            meta_columns[name] = {'file': file_name, 'dtype': values.dtype.str}
+        levels = OHLCPyramid(self).levels
+        meta_lod = {'levels': [len(level['close']) for level in levels], 'columns': {}}
+        for name in (levels[0] if levels else {}):
+            file_name = LOD_FILE.format(name=name)
+            with open(os.path.join(path, file_name), 'wb') as f:
+                for level in levels:
+                    np.ascontiguousarray(level[name], dtype=np.float64).tofile(f)
+            meta_lod['columns'][name] = {'file': file_name, 'dtype': np.dtype(np.float64).str}
+        np.ascontiguousarray(self.day_starts, dtype=np.int64).tofile(
+            os.path.join(path, DAY_STARTS_FILE))
+        self.day_dates.astype('datetime64[D]').astype(np.int64).tofile(
+            os.path.join(path, DAY_DATES_FILE))
+
+        meta = {
+            'version': STORE_VERSION,
+            'symbol': symbol,
+            'tz': self.tz,
+            'rows': len(self),
+            'days': len(self.day_starts),
+            'columns': meta_columns,
+            'lod': meta_lod,
+            'summary': self.summary(),
+        }
+        # meta.json goes last so a half-written store is never picked up
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def __len__(self):
+        return len(self.columns['epoch'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def add_column(self, name, values):
+        """Attach a derived in-memory column (never written back to disk)"""
+        self.columns[name] = np.asarray(values)
+
+    def append(self, columns):
+        """Add candles at the end from a dict of column arrays.
+
+        Columns are grown into buffers with spare capacity, so a stream of
+        small appends copies the existing data only now and then; derived
+        columns not in `columns` are left for the caller to extend.
+        """
+        n = len(self)
+        m = len(columns['epoch'])
+        if m == 0:
+            return
+        for name, values in columns.items():
+            current = self.columns[name]
+            buffer = self._buffers.get(name)
+            if buffer is None or len(buffer) < n + m or not np.may_share_memory(buffer, current):
+                buffer = np.empty(max(2 * (n + m), 1024), dtype=current.dtype)
+                buffer[:n] = current[:n]
+                self._buffers[name] = buffer
+            buffer[n:n + m] = values
+            self.columns[name] = buffer[:n + m]
+        self.lod = None
+
+        # Only the last day can continue into the new candles
+        from_row = int(self.day_starts[-1]) if len(self.day_starts) else 0
+        day_starts, day_dates = build_day_index(self.columns['epoch'][from_row:], self.tz)
+        keep = max(len(self.day_starts) - 1, 0)
+        self.day_starts = np.concatenate((self.day_starts[:keep], day_starts + from_row))
+        self.day_dates = np.concatenate((self.day_dates[:keep], day_dates))
+        self._summary = None
+
+    def truncate(self, length):
+        """Drop the candles from `length` on (the buffers keep their capacity)"""
+        for name in self.columns:
+            self.columns[name] = self.columns[name][:length]
+        days = int(np.searchsorted(self.day_starts, length, side='left'))
+        self.day_starts = self.day_starts[:days]
+        self.day_dates = self.day_dates[:days]
+        self.lod = None
+        self._summary = None
+
+    def slice(self, start, end=None):
+        """In-memory store of candles [start, end)"""
+        columns = {name: np.asarray(values[start:end]) for name, values in self.columns.items()}
+        day_starts, day_dates = build_day_index(columns['epoch'], self.tz)
+        return OHLCVStore(columns, day_starts, day_dates, self.tz)
+
+    def datetimes(self, start, end):
+        """Local timestamps of candles [start, end)"""
+        return pd.to_datetime(self.columns['epoch'][start:end], unit='ns', utc=True).tz_convert(self.tz)
+
+    def datetime_at(self, idx):
+        """Local timestamp of one candle"""
+        return pd.Timestamp(int(self.columns['epoch'][idx]), unit='ns', tz='UTC').tz_convert(self.tz)
+
+    def arrays(self, start, end):
+        """Column arrays of candles [start, end) other than epoch, as views
+        (no DataFrame, no copies)"""
+        return {name: np.asarray(values[start:end]) for name, values in self.columns.items() if name != 'epoch'}
+
+    def frame(self, start, end):
+        """DataFrame of candles [start, end), reading only those rows"""
+        data = {'datetime': self.datetimes(start, end)}
+        for name, values in self.columns.items():
+            if name != 'epoch':
+                data[name] = values[start:end]
+        return pd.DataFrame(data)
+
+    def resample(self, minutes, anchor_minute=SESSION_OPEN_MINUTE):
+        """Aggregate candles into `minutes`-long bars anchored at the session open.
+
+        Bars never cross a day boundary. Returns (store, last_rows), where
+        last_rows[i] is the row of this store holding the last candle of bar i.
+        """
+        epoch = np.asarray(self.columns['epoch'])
+        if len(epoch) == 0:
+            return OHLCVStore(dict(self.columns), self.day_starts, self.day_dates, self.tz), np.empty(0, dtype=np.int64)
+
+        # Local minute at which each candle's bar starts
+        local_ns = local_epoch_ns(epoch, self.tz)
+        day, minute_of_day = np.divmod(local_ns // NS_PER_MINUTE, 1440)
+        bar_minute = day * 1440 + anchor_minute + ((minute_of_day - anchor_minute) // minutes) * minutes
+
+        is_start = np.empty(len(epoch), dtype=bool)
+        is_start[0] = True
+        np.not_equal(bar_minute[1:], bar_minute[:-1], out=is_start[1:])
+        starts = np.flatnonzero(is_start)
+        last_rows = np.append(starts[1:], len(epoch)) - 1
+
+        utc_offset = local_ns[starts] - epoch[starts]
+        columns = {
+            'epoch': bar_minute[starts] * NS_PER_MINUTE - utc_offset,
+            'open': np.asarray(self.columns['open'])[starts],
+            'high': np.maximum.reduceat(self.columns['high'], starts),
+            'low': np.minimum.reduceat(self.columns['low'], starts),
+            'close': np.asarray(self.columns['close'])[last_rows],
+        }
+        if 'volume' in self.columns:
+            columns['volume'] = np.add.reduceat(self.columns['volume'], starts)
+        day_starts, day_dates = build_day_index(columns['epoch'], self.tz)
+        return OHLCVStore(columns, day_starts, day_dates, self.tz), last_rows
+
+    def asof_rows(self, other):
+        """Row of `other` holding its last candle at or before each of ours on
+        the same day, or -1 where it has none yet (a merge-join of the two
+        sorted epoch columns)"""
+        epoch = np.asarray(self.columns['epoch'])
+        rows = np.searchsorted(np.asarray(other['epoch']), epoch, side='right') - 1
+        if len(other) == 0:
+            return rows
+        ours = self.day_dates[np.searchsorted(self.day_starts, np.arange(len(epoch)), side='right') - 1]
+        theirs = other.day_dates[np.searchsorted(other.day_starts, np.maximum(rows, 0), side='right') - 1]
+        rows[ours != theirs] = -1
+        return rows
+
+    def summary(self):
+        """Whole-dataset statistics, stored in meta.json so opening a store skips the scan"""
+        if self._summary is None:
+            summary = {'rows': len(self)}
+            if len(self):
+                summary['high'] = float(np.max(self.columns['high']))
+                summary['low'] = float(np.min(self.columns['low']))
+                if 'volume' in self.columns:
+                    summary['volume_total'] = float(np.sum(self.columns['volume']))
+                    summary['volume_mean'] = float(np.mean(self.columns['volume']))
+            self._summary = summary
+        return self._summary
+
+
+def convert_csv(csv_path, store_path, tz='Asia/Kolkata', symbol=None, sessions=DEFAULT_SESSIONS):
+    """Clean a datetime,open,high,low,close,volume CSV and save it as a store"""
+    store = OHLCVStore.from_frame(read_csv(csv_path, tz, sessions=sessions), tz)
+    store.save(store_path, symbol=symbol)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an OHLCV CSV into a memory-mapped store")
+    parser.add_argument('csv', help="datetime,open,high,low,close,volume CSV file")
+    parser.add_argument('store', help="output store directory, e.g. data/nifty_1min.ohlcv")
+    parser.add_argument('--tz', default='Asia/Kolkata', help="timezone of the CSV timestamps")
+    parser.add_argument('--symbol', default=None, help="instrument name saved in meta.json")
+    parser.add_argument('--sessions', default=None, help="JSON file of trading sessions to keep (default: 09:15-15:30)")
+    args = parser.parse_args()
+
+    sessions = TradingSessions.load(args.sessions) if args.sessions else DEFAULT_SESSIONS
+    store = convert_csv(args.csv, args.store, tz=args.tz, symbol=args.symbol, sessions=sessions)
+    print(f"Wrote {len(store)} candles over {len(store.day_starts)} days to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Opt-in timing instrumentation for the Nifty Replay Tool.
+
+A Profiler records named spans (start and duration from perf_counter_ns)
+into a fixed-size ring buffer, so a long session keeps only its most recent
+events. While disabled every call returns at once, so the hooks can stay in
+the hot paths:
+
+    start = profiler.now()
+    ...                                    # stage one
+    start = profiler.lap('stage_one', start)
+    ...                                    # stage two
+    profiler.lap('stage_two', start)
+
+    with profiler.span('load.read'):
+        ...
+
+dump() writes the buffer in Chrome trace format, for chrome://tracing or
+https://ui.perfetto.dev.
+"""
+
+
+import json
+import os
+import threading
+import time
+
+
+# Spans kept before the oldest are overwritten
+DEFAULT_CAPACITY = 100_000
+
+
+class NullSpan:
+    """Context manager doing nothing, handed out while profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """Ring buffer of (name, start_ns, duration_ns, thread id) spans"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, enabled=False):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.events = [None] * capacity
+        self.count = 0  # Spans recorded since the last clear(), including overwritten ones
+        self.threads = {}  # Thread id -> name, for the trace
+        self.lock = threading.Lock()
+
+    def now(self):
+        """Start time for lap(), or 0 while disabled"""
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def lap(self, name, start):
+        """Record a span from `start` to now and return now, to start the next stage"""
+        if not self.enabled or not start:
+            return 0
+        end = time.perf_counter_ns()
+        self.record(name, start, end)
+        return end
+
+    def span(self, name):
+        """Context manager recording the time spent in its block"""
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def record(self, name, start, end):
+        tid = threading.get_ident()
+        with self.lock:
+            if tid not in self.threads:
+                self.threads[tid] = threading.current_thread().name
+            self.events[self.count % self.capacity] = (name, start, end - start, tid)
+            self.count += 1
+
+    def clear(self):
+        with self.lock:
+            self.events = [None] * self.capacity
+            self.count = 0
+
+    def spans(self):
+        """Recorded spans, oldest first"""
+        with self.lock:
+            if self.count <= self.capacity:
+                return self.events[:self.count]
+            split = self.count % self.capacity
+            return self.events[split:] + self.events[:split]
+
+    def recent(self, window_ns=10**9):
+        """Spans that ended within the last `window_ns` nanoseconds"""
+        cutoff = time.perf_counter_ns() - window_ns
+        result = []
+        for span in reversed(self.spans()):
+            if span[1] + span[2] < cutoff:
+                break
+            result.append(span)
+        result.reverse()
+        return result
+
+    def summary(self, window_ns=10**9):
+        """{name: (count, mean_ms, max_ms)} over the last `window_ns` nanoseconds"""
+        totals = {}
+        for name, _, duration, _ in self.recent(window_ns):
+            count, total, longest = totals.get(name, (0, 0, 0))
+            totals[name] = (count + 1, total + duration, max(longest, duration))
+        return {name: (count, total / count / 1e6, longest / 1e6)
+                for name, (count, total, longest) in totals.items()}
+
+    def dump(self, file_path):
+        """Write the recorded spans as a Chrome trace (JSON object format)"""
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in self.threads.items()]
+        for name, start, duration, tid in self.spans():
+            events.append({'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': start / 1000, 'dur': duration / 1000})
+        with open(file_path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+# Shared by the chart window and the loading helpers; on from the start
+# when the REPLAY_PROFILE environment variable is set to 1
+PROFILER = Profiler(enabled=os.environ.get('REPLAY_PROFILE') == '1')
@@ -0,0 +1,516 @@
+"""
+Headless replay engine for the Nifty Replay Tool.
+
+ReplayEngine owns the loaded data, its timeframes, the indicator settings
+and the replay cursor, with no Qt involved. The chart window is a view over
+it, and the same engine can drive batch jobs or scripts:
+
+    engine = ReplayEngine()
+    engine.load_file("data/nifty_15min.csv")
+    engine.set_timeframe(15, 0)
+    for idx in engine.bars():
+        ...
+"""
+
+
+import numpy as np
+
+from data_loader import (load_csv, complete_length, infer_bar_minutes, build_day_index, SessionTimeline,
+                         CSVTail, DEFAULT_SESSIONS)
+from indicators import IndicatorEngine, SESSION_COLUMNS, add_session_columns
+from lod import OHLCPyramid
+from ohlcv_store import OHLCVStore, is_store_path
+from profiler import PROFILER
+
+
+# Columns derived from the others, recomputed rather than appended
+DERIVED_COLUMNS = SESSION_COLUMNS
+
+# Columns of another instrument put on the replayed bars
+INSTRUMENT_COLUMNS = ('open', 'high', 'low', 'close')
+
+# Display refresh period assumed when the screen doesn't report one (60 Hz)
+FRAME_NS = 1_000_000_000 // 60
+
+# Indicator parameters used until set_params() is called
+DEFAULT_PARAMS = {
+    'ema': (14,),
+    'sma': (20,),
+    'bollinger': (20, 2.0),
+    'rsi': (14,),
+    'macd': (12, 26, 9),
+}
+
+
+def read_data_file(file_path, tz, progress=None, sessions=DEFAULT_SESSIONS):
+    """Read a CSV file (through the sidecar cache) or an OHLCV store.
+
+    Returns (data, source): the OHLCVStore and, for a CSV, the (path, offset)
+    to follow it from. A half-written last row is left out and followed
+    once complete. Nothing is shared, so this can run on a worker thread;
+    progress is passed on to read_csv(). A CSV keeps only the candles in
+    `sessions`; a store is used as it was converted. The session columns
+    (VWAP, day high and low) are computed here too, unless a store has them
+    saved.
+    """
+    start = PROFILER.now()
+    if is_store_path(file_path):
+        data, source = OHLCVStore.open(file_path), None
+    else:
+        # Only complete rows are parsed; following starts right after them
+        length = complete_length(file_path)
+        df = load_csv(file_path, tz, progress=progress, sessions=sessions, length=length)
+        start = PROFILER.lap('load.csv', start)
+        data = OHLCVStore.from_frame(df, tz)
+        source = (file_path, length)
+    start = PROFILER.lap('load.store', start)
+    if not all(name in data for name in SESSION_COLUMNS):
+        add_session_columns(data)
+    PROFILER.lap('load.session_columns', start)
+    return data, source
+
+
+class TimeframeLevel:
+    """One timeframe of the loaded file, with everything derived from it.
+
+    Nothing here reads every candle up front, so a memory-mapped store only
+    pages in what is drawn (and what indicators are computed over).
+    """
+
+    def __init__(self, data, last_rows, bar_minutes):
+        self.data = data
+        # Row of the loaded file holding the last candle of each bar (None: the loaded file itself)
+        self.last_rows = last_rows
+        self.timeline = SessionTimeline(data['epoch'], bar_minutes)
+        self.indicators = IndicatorEngine()
+        self.indicators.set_data(data)
+        self.aligned = {}  # Instrument name -> its columns on these bars
+        self.pyramid = OHLCPyramid(data)  # For drawing zoomed out
+
+    def base_row(self, idx):
+        """Row of the loaded file holding the last candle of bar `idx`"""
+        return idx if self.last_rows is None else int(self.last_rows[idx])
+
+    def bar_at(self, base_row):
+        """Bar holding a row of the loaded file"""
+        if self.last_rows is None:
+            return base_row
+        return int(np.searchsorted(self.last_rows, base_row, side='left'))
+
+    def extend(self, start):
+        """Catch up with bars appended to (or replaced in) the data from row `start` on"""
+        self.timeline = SessionTimeline(self.data['epoch'], self.timeline.bar_minutes)
+        self.indicators.extend(self.data, start)
+        self.aligned = {}
+        self.pyramid.extend(start)
+
+
+class Instrument:
+    """Another instrument (futures, an option) replayed alongside the loaded file"""
+
+    def __init__(self, name, data, bar_minutes=None):
+        self.name = name
+        self.data = data
+        self.base_minutes = bar_minutes or infer_bar_minutes(data['epoch'])
+        self.levels = {}  # minutes -> resampled OHLCVStore
+
+    def timeframe(self, minutes):
+        """The instrument in `minutes` bars, or None if it can't be built from its data"""
+        if minutes % self.base_minutes != 0:
+            return None
+        if minutes not in self.levels:
+            if minutes == self.base_minutes:
+                self.levels[minutes] = self.data
+            else:
+                self.levels[minutes] = self.data.resample(minutes)[0]
+        return self.levels[minutes]
+
+    def align(self, data, minutes):
+        """Columns of this instrument on the bars of `data` (a timeframe of the
+        loaded file), or None when it has no `minutes` bars.
+
+        open/high/low/close are NaN where the instrument has no bar starting
+        at the same time; 'last' carries its latest close forward within the
+        day, for spreads against instruments that trade less often.
+        """
+        own = self.timeframe(minutes)
+        if own is None:
+            return None
+        rows = data.asof_rows(own)
+        missing = rows < 0
+        exact = ~missing & (np.asarray(own['epoch'])[rows] == np.asarray(data['epoch']))
+        columns = {}
+        for name in INSTRUMENT_COLUMNS:
+            values = np.asarray(own[name], dtype=np.float64)[rows]
+            if name == 'close':
+                columns['last'] = np.where(missing, np.nan, values)
+            columns[name] = np.where(exact, values, np.nan)
+        return columns
+
+
+class ReplayEngine:
+    """Loaded data, timeframes, indicator settings and the replay cursor.
+
+    Moving the cursor with step(), advance() or seek() calls every listener
+    with (current_idx, incremental), where incremental is True when the
+    replay moved forward (by one bar, or a batch of them with advance()).
+    bars() steps through the data as a generator instead.
+
+    Other instruments added with add_instrument() follow the same cursor:
+    their bars are joined onto the replayed timeline by time, once per
+    timeframe, and read with instrument_window().
+    """
+
+    def __init__(self, tz='Asia/Kolkata', sessions=DEFAULT_SESSIONS):
+        self.tz = tz
+        self.sessions = sessions  # TradingSessions kept when reading CSV files
+        self.base_data = None  # OHLCVStore of the loaded file
+        self.base_minutes = 1  # Bar length of the loaded file
+        self.levels = {}  # minutes -> TimeframeLevel
+        self.level = None  # TimeframeLevel being replayed
+        self.current_minutes = None  # Key of levels being replayed
+        self.current_idx = 0
+        self.params = dict(DEFAULT_PARAMS)
+        self.listeners = []
+        self.source = None  # (path, offset) of the loaded CSV file, for follow()
+        self.tail = None  # CSVTail while following the loaded file
+        self.instruments = {}  # name -> Instrument replayed in lockstep, in the order added
+
+    @property
+    def data(self):
+        """OHLCVStore being replayed (loaded file or a resampled timeframe)"""
+        return self.level.data if self.level is not None else None
+
+    @property
+    def timeline(self):
+        return self.level.timeline if self.level is not None else None
+
+    @property
+    def indicators(self):
+        return self.level.indicators if self.level is not None else None
+
+    def __len__(self):
+        return len(self.level.data) if self.level is not None else 0
+
+    def load_file(self, file_path, progress=None):
+        """Load a CSV file (through the sidecar cache) or an OHLCV store"""
+        data, source = read_data_file(file_path, self.tz, progress, self.sessions)
+        self.load(data, source=source)
+        return data
+
+    def load(self, data, bar_minutes=None, source=None):
+        """Replay a new OHLCVStore; call set_timeframe() before stepping.
+
+        bar_minutes is the bar length of the data, inferred from the
+        timestamps when not given; source is the (path, offset) of the CSV
+        file it was read from, for follow().
+        """
+        if len(data) == 0:
+            raise ValueError("No data remaining after filtering trading hours")
+        if not all(name in data for name in SESSION_COLUMNS):
+            add_session_columns(data)
+        self.base_data = data
+        self.base_minutes = bar_minutes or infer_bar_minutes(data['epoch'])
+        self.levels = {}
+        self.level = None
+        self.current_minutes = None
+        self.current_idx = 0
+        self.source = source
+        self.tail = None
+
+    def add_instrument(self, name, data, bar_minutes=None):
+        """Replay another OHLCVStore in lockstep with the loaded one, replacing
+        any instrument of the same name"""
+        if len(data) == 0:
+            raise ValueError(f"No data for {name}")
+        self.instruments[name] = Instrument(name, data, bar_minutes)
+        for level in self.levels.values():
+            level.aligned.pop(name, None)
+
+    def remove_instrument(self, name):
+        self.instruments.pop(name, None)
+        for level in self.levels.values():
+            level.aligned.pop(name, None)
+
+    def aligned(self, name):
+        """An instrument's columns on every replayed bar (see Instrument.align),
+        or None when it can't be shown on the replayed timeframe"""
+        if name not in self.level.aligned:
+            self.level.aligned[name] = self.instruments[name].align(self.level.data, self.current_minutes)
+        return self.level.aligned[name]
+
+    def instrument_window(self, name, start, end):
+        """Slice of an instrument's aligned columns for candles [start, end), or None"""
+        columns = self.aligned(name)
+        if columns is None:
+            return None
+        return {column: values[start:end] for column, values in columns.items()}
+
+    def follow(self):
+        """Start following the loaded CSV file; poll() then picks up appended rows"""
+        if self.source is None:
+            raise ValueError("Only a loaded CSV file can be followed")
+        if self.tail is None:
+            file_path, offset = self.source
+            self.tail = CSVTail(file_path, self.tz, offset, self.sessions)
+
+    def poll(self):
+        """Append the complete rows written to the followed file since the last
+        poll; returns the number of candles added"""
+        return self.append(self.tail.read())
+
+    def append(self, frame):
+        """Add the candles of a cleaned frame that come after the loaded data.
+
+        Returns the number of candles added; the cursor does not move.
+        """
+        if frame is None or len(frame) == 0:
+            return 0
+        new = OHLCVStore.from_frame(frame, self.tz)
+        keep = new['epoch'] > self.base_data['epoch'][-1]
+        if not keep.any():
+            return 0
+        self.extend_base({name: new[name][keep] for name in new.columns}, len(self.base_data))
+        return int(keep.sum())
+
+    def update_bar(self, bar, bar_minutes=None):
+        """Add a bar (dict of column values) at the end of the loaded data, or
+        replace the last candle when the bar starts at the same time, as a
+        bar that is still forming does. The first bar with nothing loaded
+        starts new data of `bar_minutes` bars. Returns False, changing
+        nothing, for a bar older than the last candle or the same as it.
+        """
+        columns = {name: np.array([value]) for name, value in bar.items()}
+        if self.base_data is None:
+            day_starts, day_dates = build_day_index(columns['epoch'], self.tz)
+            self.load(OHLCVStore(columns, day_starts, day_dates, self.tz), bar_minutes)
+            return True
+        n = len(self.base_data)
+        last = self.base_data['epoch'][n - 1]
+        if bar['epoch'] < last:
+            return False
+        if bar['epoch'] == last and all(self.base_data[name][n - 1] == value
+                                        for name, value in bar.items() if name in self.base_data):
+            return False
+        self.extend_base(columns, n - 1 if bar['epoch'] == last else n)
+        return True
+
+    def extend_base(self, columns, start):
+        """Replace the loaded candles from row `start` on with new ones.
+
+        Every timeframe built so far is extended in place: resampled ones
+        rebuild only the bars from the one holding row `start`, session
+        columns only the session holding it, and cached indicators continue
+        from their last values.
+        """
+        m = len(columns['epoch'])
+        for name in DERIVED_COLUMNS:
+            columns.pop(name, None)
+        for name, values in self.base_data.columns.items():
+            if name not in columns and name not in DERIVED_COLUMNS:
+                columns[name] = np.full(m, np.nan) if values.dtype.kind == 'f' else np.zeros(m, values.dtype)
+        self.base_data.truncate(start)
+        self.base_data.append({name: columns[name] for name in self.base_data.columns if name in columns})
+        add_session_columns(self.base_data, start)
+
+        for minutes, level in self.levels.items():
+            if level.data is self.base_data:
+                level.extend(start)
+                continue
+            # The bar holding row `start` may have been still forming
+            bar = min(level.bar_at(start), len(level.data) - 1)
+            base_start = int(level.last_rows[bar - 1]) + 1 if bar > 0 else 0
+            tail, tail_rows = self.base_data.slice(base_start).resample(minutes)
+            level.data.truncate(bar)
+            level.data.append(tail.columns)
+            level.last_rows = np.concatenate((level.last_rows[:bar], tail_rows + base_start))
+            for name in SESSION_COLUMNS:
+                level.data.add_column(name, self.base_data[name][level.last_rows])
+            level.extend(bar)
+
+    def timeframe(self, minutes):
+        """Cached TimeframeLevel for a timeframe, or None if it can't be
+        built from the loaded file"""
+        if self.base_data is None or minutes % self.base_minutes != 0:
+            return None
+        if minutes not in self.levels:
+            if minutes == self.base_minutes:
+                data, last_rows = self.base_data, None
+            else:
+                data, last_rows = self.base_data.resample(minutes)
+                # A bar's session values are those of its last candle
+                for name in SESSION_COLUMNS:
+                    data.add_column(name, self.base_data[name][last_rows])
+            self.levels[minutes] = TimeframeLevel(data, last_rows, minutes)
+        return self.levels[minutes]
+
+    def set_timeframe(self, minutes, current_idx=None):
+        """Replay another timeframe of the loaded file.
+
+        Without current_idx the cursor stays on the bar holding the base
+        candle the replay is currently at. Returns the TimeframeLevel, or
+        None (leaving the replay unchanged) if it can't be built.
+        """
+        level = self.timeframe(minutes)
+        if level is None:
+            return None
+        if current_idx is None:
+            current_idx = 0
+            if self.level is not None:
+                current_idx = level.bar_at(self.level.base_row(self.current_idx))
+        self.level = level
+        self.current_minutes = minutes
+        self.current_idx = int(np.clip(current_idx, 0, len(level.data) - 1))
+        return level
+
+    def set_params(self, params):
+        """Update indicator parameters, dropping cached results only for those that changed"""
+        for name, values in params.items():
+            if self.params.get(name) != values:
+                self.params[name] = values
+                for level in self.levels.values():
+                    level.indicators.invalidate(name)
+
+    def indicator(self, name):
+        """Full-series result of an indicator with the current parameters"""
+        return self.indicators.get(name, *self.params[name])
+
+    def indicator_window(self, name, start, end):
+        """Slice of a full-series indicator for candles [start, end)"""
+        result = self.indicator(name)
+        if isinstance(result, tuple):
+            return tuple(values[start:end] for values in result)
+        return result[start:end]
+
+    def window(self, count):
+        """(start, end) of the last `count` candles up to and including the cursor"""
+        return max(0, self.current_idx - count + 1), self.current_idx + 1
+
+    def add_listener(self, callback):
+        """Call callback(current_idx, incremental) whenever the cursor moves"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def notify(self, incremental):
+        for callback in self.listeners:
+            callback(self.current_idx, incremental)
+
+    def step(self):
+        """Advance one bar; False (and no event) when already at the last bar"""
+        return self.advance(1) == 1
+
+    def advance(self, count):
+        """Advance up to `count` bars with a single event; returns the bars moved
+        (0, and no event, when already at the last bar)"""
+        if self.level is None:
+            return 0
+        target = min(self.current_idx + count, len(self.level.data) - 1)
+        moved = target - self.current_idx
+        if moved > 0:
+            self.current_idx = target
+            self.notify(True)
+        return max(moved, 0)
+
+    def seek(self, idx):
+        """Move the cursor to a bar, clipped to the data"""
+        if self.level is None:
+            return
+        self.current_idx = int(np.clip(idx, 0, len(self.level.data) - 1))
+        self.notify(False)
+
+    def bars(self, stop=None):
+        """Step to each following bar up to `stop` (exclusive), yielding its index.
+
+        Listeners are not called, so a batch loop only pays for the
+        generator; read values from `data` and indicator() by index.
+        """
+        if self.level is None:
+            return
+        stop = len(self.level.data) if stop is None else min(stop, len(self.level.data))
+        for idx in range(self.current_idx + 1, stop):
+            self.current_idx = idx
+            yield idx
+
+    @property
+    def day_starts(self):
+        """Row where each day of the replayed data starts"""
+        return self.level.data.day_starts
+
+    @property
+    def day_dates(self):
+        """Date of each day of the replayed data"""
+        return self.level.data.day_dates
+
+    def current_day(self):
+        """Index into the day index of the day holding current_idx"""
+        return int(np.searchsorted(self.day_starts, self.current_idx, side='right')) - 1
+
+    def seek_day(self, day):
+        """Move to the session open of a day in the day index; False if there is none"""
+        if self.level is None or not 0 <= day < len(self.day_starts):
+            return False
+        self.seek(int(self.day_starts[day]))
+        return True
+
+    def seek_date(self, date):
+        """Move to the first candle on or after a date; False if there is none"""
+        if self.level is None:
+            return False
+        day = np.searchsorted(self.day_dates, np.datetime64(date, 'D'), side='left')
+        return self.seek_day(int(day))
+
+
+class PlaybackClock:
+    """Wall-clock pacing for playing a replay at `interval_ms` per bar.
+
+    A timer stepping one bar per tick falls behind as soon as a frame takes
+    longer than the interval. Instead the player asks due() how many bars
+    should have been shown by now, advances them all with one redraw and
+    reports the frame's cost to frame_done(); next_delay() then waits for
+    the next bar, but never less than a display refresh (or the measured
+    render cost plus some slack, when drawing is slower than that). Slow
+    frames make playback skip frames, not lose pace. Times are
+    perf_counter_ns() nanoseconds.
+    """
+
+    def __init__(self, interval_ms, frame_ns=FRAME_NS):
+        self.interval_ns = max(int(interval_ms * 1_000_000), 1)
+        self.frame_ns = frame_ns
+        self.render_ns = 0  # Smoothed cost of one frame
+        self.origin = 0
+        self.taken = 0  # Bars taken since origin
+        self.last_frame = None  # When the last frame started
+
+    def start(self, now):
+        self.origin = now
+        self.taken = 0
+        self.last_frame = None
+
+    def set_interval(self, interval_ms, now):
+        """Change the pace from now on, without a burst of catch-up bars"""
+        self.interval_ns = max(int(interval_ms * 1_000_000), 1)
+        self.start(now)
+
+    def due(self, now):
+        """Bars that should have been shown by `now` and weren't yet"""
+        return max((now - self.origin) // self.interval_ns - self.taken, 0)
+
+    def take(self, count, now):
+        """Mark `count` due bars as shown by a frame starting at `now`"""
+        self.taken += count
+        self.last_frame = now
+
+    def frame_done(self, cost_ns):
+        """Fold the cost of the last frame (step, redraw and repaint) into render_ns"""
+        self.render_ns = cost_ns if not self.render_ns else (7 * self.render_ns + cost_ns) // 8
+
+    def next_delay(self, now):
+        """Nanoseconds to wait before the next tick"""
+        next_bar = self.origin + (self.taken + 1) * self.interval_ns
+        if self.last_frame is None:
+            return max(next_bar - now, 0)
+        # Leave a quarter of the time idle for input when drawing is the bottleneck
+        next_frame = self.last_frame + max(self.frame_ns, self.render_ns * 5 // 4)
+        return max(next_bar - now, next_frame - now, 0)
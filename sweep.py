@@ -0,0 +1,190 @@
+"""
+Parameter sweeps of backtest rules across every CPU core.
+
+Rules are backtest.py expressions with {placeholders}; each combination of
+the placeholder grids is backtested in a process pool and the results come
+back as a table ranked by one summary metric. The OHLCV columns are copied
+once into shared memory and mapped by every worker, never pickled per task.
+
+    python sweep.py data/nifty_15min.csv \\
+        --entry "crosses_above(ema({fast}), ema({slow}))" \\
+        --exit "crosses_below(ema({fast}), ema({slow}))" \\
+        --grid fast=5:50:5 --grid slow=50,100,200
+"""
+
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import run_backtest, SUMMARY_COLUMNS
+from data_loader import TradingSessions, DEFAULT_SESSIONS
+from ohlcv_store import OHLCVStore
+from replay_engine import ReplayEngine
+
+
+# Per-process state of a sweep worker, set up once by init_worker()
+_worker = {}
+
+
+def attach_block(name):
+    """Map an existing shared memory block without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedStore:
+    """Columns and day index of an OHLCVStore copied into shared memory.
+
+    `spec` is the small picklable description workers attach with; the
+    creating process must call close() when the sweep is done.
+    """
+
+    def __init__(self, store, bar_minutes):
+        self.blocks = []
+        arrays = dict(store.columns)
+        arrays['day_starts'] = store.day_starts
+        arrays['day_dates'] = np.asarray(store.day_dates).astype(np.int64)
+        self.spec = {'tz': store.tz, 'bar_minutes': bar_minutes, 'arrays': {}}
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            self.blocks.append(block)
+            self.spec['arrays'][name] = (block.name, values.dtype.str, len(values))
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach_store(spec):
+    """OHLCVStore over the shared blocks of a spec, plus the blocks to keep alive"""
+    blocks, arrays = [], {}
+    for name, (block_name, dtype, length) in spec['arrays'].items():
+        block = attach_block(block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+    day_starts = arrays.pop('day_starts')
+    day_dates = arrays.pop('day_dates').astype('datetime64[D]')
+    return OHLCVStore(arrays, day_starts, day_dates, spec['tz']), blocks
+
+
+def init_worker(spec):
+    """Process pool initializer: map the shared data into a worker's own engine"""
+    store, blocks = attach_store(spec)
+    engine = ReplayEngine(spec['tz'])
+    engine.load(store, spec['bar_minutes'])
+    engine.set_timeframe(spec['bar_minutes'], 0)
+    _worker['engine'] = engine
+    _worker['blocks'] = blocks
+
+
+def run_combination(task):
+    """Backtest one parameter combination in a worker; returns a result row"""
+    entry, exit, params, options = task
+    result = run_backtest(_worker['engine'], entry.format(**params), exit.format(**params), **options)
+    return {**params, **result.summary()}
+
+
+def expand_grid(grid):
+    """Every combination of a {name: values} grid as a list of dicts"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_sweep(engine, entry, exit, grid, metric='total_pnl', ascending=False,
+              workers=None, **options):
+    """Backtest every combination of `grid` over the engine's current timeframe.
+
+    entry and exit are rule templates such as "close > ema({period})";
+    options are passed on to run_backtest(). Returns a DataFrame with one
+    row per combination, best `metric` first; `metric` is a summary column
+    or a grid name.
+    """
+    if metric not in SUMMARY_COLUMNS and metric not in grid:
+        raise ValueError(f"Unknown metric {metric!r}; choose from {', '.join(SUMMARY_COLUMNS)}")
+    combinations = expand_grid(grid)
+    if not combinations:
+        return pd.DataFrame()
+    workers = workers or os.cpu_count() or 1
+    tasks = [(entry, exit, params, options) for params in combinations]
+    chunksize = max(1, len(tasks) // (workers * 4))
+
+    shared = SharedStore(engine.data, engine.current_minutes)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(shared.spec,)) as executor:
+            rows = list(executor.map(run_combination, tasks, chunksize=chunksize))
+    finally:
+        shared.close()
+
+    results = pd.DataFrame(rows)
+    return results.sort_values(metric, ascending=ascending, kind='stable').reset_index(drop=True)
+
+
+def parse_grid_values(text):
+    """'5:50:5' (like range) or '10,20,50' as a list of ints or floats"""
+    def number(value):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+
+    if ':' in text:
+        parts = [float(part) for part in text.split(':')]
+        return [number(value) for value in np.arange(*parts)]
+    return [number(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep backtest rule parameters across all CPU cores")
+    parser.add_argument('data', help="CSV file or OHLCV store")
+    parser.add_argument('--entry', required=True, help="entry rule template, e.g. \"close > ema({period})\"")
+    parser.add_argument('--exit', required=True, help="exit rule template, e.g. \"close < ema({period})\"")
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=VALUES',
+                        help="placeholder values as start:stop:step or a comma list; repeat per placeholder")
+    parser.add_argument('--timeframe', type=int, default=None, help="bar length in minutes (default: the file's own)")
+    parser.add_argument('--sessions', default=None, help="JSON file of trading sessions to keep (default: 09:15-15:30)")
+    parser.add_argument('--metric', default='total_pnl', help=f"summary column to rank by: {', '.join(SUMMARY_COLUMNS)}")
+    parser.add_argument('--ascending', action='store_true', help="rank the smallest metric first")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--short', action='store_true', help="trade short instead of long")
+    parser.add_argument('--fill', choices=('close', 'next_open'), default='close', help="fill price of signals")
+    parser.add_argument('--intraday', action='store_true', help="close every trade at the day's last candle")
+    parser.add_argument('--cost', type=float, default=0.0, help="cost per trade in points")
+    parser.add_argument('--top', type=int, default=20, help="rows to print")
+    parser.add_argument('--output', default=None, help="write the full table to this CSV file")
+    args = parser.parse_args()
+
+    grid = {}
+    for item in args.grid:
+        name, _, values = item.partition('=')
+        grid[name.strip()] = parse_grid_values(values)
+    if args.metric not in SUMMARY_COLUMNS and args.metric not in grid:
+        parser.error(f"--metric must be one of {', '.join(SUMMARY_COLUMNS)} or a grid name")
+
+    engine = ReplayEngine(sessions=TradingSessions.load(args.sessions) if args.sessions else DEFAULT_SESSIONS)
+    engine.load_file(args.data)
+    minutes = args.timeframe or engine.base_minutes
+    if engine.set_timeframe(minutes, 0) is None:
+        parser.error(f"{minutes}min can't be built from {engine.base_minutes}min data")
+
+    results = run_sweep(engine, args.entry, args.exit, grid, metric=args.metric,
+                        ascending=args.ascending, workers=args.workers,
+                        direction=-1 if args.short else 1, fill=args.fill,
+                        intraday=args.intraday, cost=args.cost)
+    if args.output:
+        results.to_csv(args.output, index=False)
+    print(results.head(args.top).to_string())
+
+
+if __name__ == "__main__":
+    main()
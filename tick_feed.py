@@ -0,0 +1,327 @@
+"""
+Tick feed adapter for the Nifty Replay Tool.
+
+A TickFeed runs an asyncio loop on a background thread, reads ticks from a
+pluggable source, aggregates them into bars and hands them to the GUI
+thread: completed bars through a bounded thread-safe queue, the bar still
+forming through a single slot that always holds its latest state (handed
+on by drain() only when a tick changed it). The GUI only ever calls
+drain(), which never blocks.
+
+Sources are given as URLs:
+
+    tcp://127.0.0.1:9000        line stream from a TCP publisher
+    udp://127.0.0.1:9000        one or more lines per datagram
+    unix:///tmp/ticks.sock      line stream from a Unix socket
+    file://ticks.csv?speed=10   stand-in replayer of a recorded tick file
+
+Each line is `timestamp,price[,volume]`. Timestamps are epoch seconds,
+milliseconds, microseconds or nanoseconds, or text such as `03-06-2024 09:15:02` in the
+feed's timezone; lines that don't parse (e.g. a header) are counted and
+skipped. A bar completes when the first tick of a later bar arrives.
+"""
+
+
+import asyncio
+import queue
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from data_loader import NS_PER_MINUTE, DEFAULT_SESSIONS
+from ohlcv_store import SESSION_OPEN_MINUTE
+
+# Text timestamps tried before falling back to pandas inference
+TIMESTAMP_FORMATS = ('%d-%m-%Y %H:%M:%S', '%d-%m-%Y %H:%M:%S.%f', '%d-%m-%Y %H:%M',
+                     '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S')
+
+
+def parse_tick(line, tz):
+    """(epoch_ns, price, volume) from a tick line; raises ValueError if it doesn't parse"""
+    fields = line.strip().split(',')
+    if len(fields) < 2:
+        raise ValueError(f"Not a tick: {line!r}")
+    price = float(fields[1])
+    volume = float(fields[2]) if len(fields) > 2 and fields[2] else 0.0
+    stamp = fields[0].strip()
+    try:
+        value = float(stamp)
+    except ValueError:
+        timestamp = parse_timestamp(stamp)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(tz)
+        return timestamp.value, price, volume
+    # Epoch seconds, milliseconds, microseconds or nanoseconds, told apart by magnitude
+    if value < 1e11:
+        return int(value * 1e9), price, volume
+    if value < 1e14:
+        return int(value * 1e6), price, volume
+    if value < 1e17:
+        return int(value * 1e3), price, volume
+    return int(value), price, volume
+
+
+def parse_timestamp(text):
+    """Timestamp from text, trying the common fixed formats first"""
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return pd.Timestamp(datetime.strptime(text, fmt))
+        except ValueError:
+            pass
+    return pd.to_datetime(text, dayfirst=True)
+
+
+class BarAggregator:
+    """Builds `minutes`-long bars from ticks, anchored at the session open
+    like resampled timeframes. Ticks outside the trading sessions are
+    dropped, like rows of a CSV."""
+
+    def __init__(self, minutes, tz, anchor_minute=SESSION_OPEN_MINUTE, sessions=DEFAULT_SESSIONS):
+        self.minutes = minutes
+        self.tz = tz
+        self.anchor_minute = anchor_minute
+        self.sessions = sessions
+        self.bar = None  # Bar still forming, as a dict of column values
+        self.late = 0  # Ticks dropped for belonging to a bar already handed on
+        self.offsets = {}  # UTC hour -> local UTC offset in ns
+
+    def local_offset(self, epoch_ns):
+        hour = epoch_ns // (60 * NS_PER_MINUTE)
+        if hour not in self.offsets:
+            offset = pd.Timestamp(hour * 3600, unit='s', tz=self.tz).utcoffset()
+            self.offsets[hour] = int(offset.total_seconds()) * 10**9
+        return self.offsets[hour]
+
+    def add(self, epoch_ns, price, volume):
+        """Add a tick; returns the bar it completed, or None"""
+        offset = self.local_offset(epoch_ns)
+        day, minute_of_day = divmod((epoch_ns + offset) // NS_PER_MINUTE, 1440)
+        if not any(start <= minute_of_day <= end for start, end in self.sessions.windows_on(day)):
+            return None
+        bar_minute = (day * 1440 + self.anchor_minute
+                      + (minute_of_day - self.anchor_minute) // self.minutes * self.minutes)
+        bar_epoch = bar_minute * NS_PER_MINUTE - offset
+
+        completed = None
+        if self.bar is not None and bar_epoch < self.bar['epoch']:
+            self.late += 1
+            return None
+        if self.bar is None or bar_epoch > self.bar['epoch']:
+            completed = self.bar
+            self.bar = {'epoch': bar_epoch, 'open': price, 'high': price,
+                        'low': price, 'close': price, 'volume': volume}
+        else:
+            bar = self.bar
+            bar['high'] = max(bar['high'], price)
+            bar['low'] = min(bar['low'], price)
+            bar['close'] = price
+            bar['volume'] += volume
+        return completed
+
+
+async def stream_lines(reader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        yield line.decode(errors='replace')
+
+
+async def tcp_lines(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        async for line in stream_lines(reader):
+            yield line
+    finally:
+        writer.close()
+
+
+async def unix_lines(path):
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        async for line in stream_lines(reader):
+            yield line
+    finally:
+        writer.close()
+
+
+class DatagramLines(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.lines = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        for line in data.decode(errors='replace').splitlines():
+            self.lines.put_nowait(line)
+
+
+async def udp_lines(host, port):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(DatagramLines, local_addr=(host, port))
+    try:
+        while True:
+            yield await protocol.lines.get()
+    finally:
+        transport.close()
+
+
+async def file_lines(path, tz, speed=1.0):
+    """Lines of a recorded tick file, paced by their timestamps (speed=0: no pacing)"""
+    start_tick = start_clock = None
+    with open(path) as f:
+        for line in f:
+            if speed > 0:
+                try:
+                    epoch_ns = parse_tick(line, tz)[0]
+                except ValueError:
+                    epoch_ns = None
+                if epoch_ns is not None:
+                    if start_tick is None:
+                        start_tick, start_clock = epoch_ns, time.monotonic()
+                    delay = (epoch_ns - start_tick) / 1e9 / speed - (time.monotonic() - start_clock)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+            yield line
+
+
+def open_source(url, tz):
+    """Async line iterator for a feed URL (see the module docstring)"""
+    parsed = urlparse(url)
+    if parsed.scheme == 'tcp':
+        return tcp_lines(parsed.hostname, parsed.port)
+    if parsed.scheme == 'udp':
+        return udp_lines(parsed.hostname, parsed.port)
+    if parsed.scheme == 'unix':
+        return unix_lines(parsed.path)
+    if parsed.scheme == 'file':
+        speed = float(parse_qs(parsed.query).get('speed', ['1'])[0])
+        return file_lines(parsed.netloc + parsed.path, tz, speed)
+    raise ValueError(f"Unsupported feed URL: {url}")
+
+
+class TickFeed:
+    """Background-thread tick ingestion producing bars for the GUI thread.
+
+    When the queue of completed bars is full the feed stops reading its
+    source until there is room again (so sockets push back on the
+    publisher); how long it waited is reported by stats().
+    """
+
+    def __init__(self, url, minutes, tz, max_bars=1000, sessions=DEFAULT_SESSIONS):
+        self.url = url
+        self.tz = tz
+        self.aggregator = BarAggregator(minutes, tz, sessions=sessions)
+        self.bars = queue.Queue(maxsize=max_bars)
+        self.lock = threading.Lock()
+        self.forming = None  # Snapshot of the bar still forming
+        self.version = 0  # Bumped whenever forming changes
+        self.drained_version = 0  # version of the forming bar drain() last returned
+        self.error = None  # Exception that ended the feed, if any
+        self.thread = None
+        self.loop = None
+        self.task = None
+        self.stopped = False  # Set by stop(), even before the task exists
+        self.counters = {'ticks': 0, 'bad_lines': 0, 'bars': 0, 'max_queue': 0,
+                         'blocked_ns': 0, 'lag_ns': 0}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="TickFeed", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Cancel reading the source and return at once; the feed thread (a
+        daemon) finishes on its own, so this is safe on the GUI thread.
+        Call join() to wait for it."""
+        with self.lock:
+            self.stopped = True
+            loop, task = self.loop, self.task
+        if task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:  # The loop closed in the meantime
+                pass
+
+    def join(self, timeout=None):
+        """Wait for the feed thread to finish (not from the GUI thread)"""
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            with self.lock:
+                if self.stopped:
+                    return
+                self.loop = loop
+                self.task = loop.create_task(self.consume())
+            loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            loop.close()
+
+    async def consume(self):
+        async for line in open_source(self.url, self.tz):
+            try:
+                epoch_ns, price, volume = parse_tick(line, self.tz)
+            except ValueError:
+                self.counters['bad_lines'] += 1
+                continue
+            self.counters['ticks'] += 1
+            self.counters['lag_ns'] = time.time_ns() - epoch_ns
+            completed = self.aggregator.add(epoch_ns, price, volume)
+            if completed is not None:
+                await self.put(completed)
+            # Only this thread writes forming, so it can be compared unlocked
+            bar = self.aggregator.bar
+            if bar is not None and bar != self.forming:
+                with self.lock:
+                    self.forming = dict(bar)
+                    self.version += 1
+
+    async def put(self, bar):
+        """Queue a completed bar, waiting (without blocking the loop) while the queue is full"""
+        blocked_since = None
+        while True:
+            try:
+                self.bars.put_nowait(bar)
+                break
+            except queue.Full:
+                if blocked_since is None:
+                    blocked_since = time.perf_counter_ns()
+                await asyncio.sleep(0.005)
+        if blocked_since is not None:
+            self.counters['blocked_ns'] += time.perf_counter_ns() - blocked_since
+        self.counters['bars'] += 1
+        self.counters['max_queue'] = max(self.counters['max_queue'], self.bars.qsize())
+
+    def drain(self):
+        """Completed bars queued so far, in order, and the latest snapshot of the
+        forming bar (None if it hasn't changed since the last drain() or is
+        already among the bars); never blocks"""
+        with self.lock:
+            forming = self.forming if self.version != self.drained_version else None
+            self.drained_version = self.version
+        bars = []
+        while True:
+            try:
+                bars.append(self.bars.get_nowait())
+            except queue.Empty:
+                break
+        if forming is not None and bars and forming['epoch'] <= bars[-1]['epoch']:
+            forming = None
+        return bars, forming
+
+    def stats(self):
+        """Counters for monitoring: ticks, bad lines, late ticks, bars, queue
+        depth, time blocked on a full queue and the age of the last tick"""
+        return dict(self.counters, late_ticks=self.aggregator.late, queue=self.bars.qsize())